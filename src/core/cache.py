@@ -3,11 +3,13 @@ Cache - Caching av PDF-bilder och extraherad text för performance.
 """
 
 from typing import Optional, Dict, Tuple
+from collections import OrderedDict
 from pathlib import Path
 from PIL import Image
 import hashlib
-import pickle
+import io
 import os
+import time
 from .logger import get_logger
 
 logger = get_logger()
@@ -20,22 +22,55 @@ class Cache:
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(exist_ok=True)
         
-        # In-memory cache för snabb åtkomst
-        self._image_cache: Dict[str, Image.Image] = {}
-        self._text_cache: Dict[str, str] = {}
+        # In-memory cache för snabb åtkomst (LRU: senast använd sist).
+        # Bilder hålls som PNG-kodade bytes i stället för avkodade
+        # Image-objekt - råpixlar för en A4-sida väger tiotals MB medan
+        # PNG-bytes är en bråkdel, så många fler sidor ryms i minnet.
+        self._image_cache: OrderedDict[str, bytes] = OrderedDict()
+        self._text_cache: OrderedDict[str, str] = OrderedDict()
         self._max_memory_items = 50  # Max antal objekt i minnet
+
+        # Memoiserade mtime-värden (path -> (mtime, tidpunkt)) så att inte
+        # varje cache-lookup kostar ett stat()-syscall
+        self._mtime_cache: Dict[str, Tuple[float, float]] = {}
+        self._mtime_ttl = 5.0  # Sekunder innan mtime kontrolleras igen
     
-    def _get_cache_key(self, pdf_path: str, page_num: int = 0, dpi: int = 200) -> str:
-        """Skapar en cache-nyckel baserat på PDF-sökväg, sidnummer och DPI."""
-        # Använd filens modificeringstid för att detektera ändringar
-        try:
-            mtime = os.path.getmtime(pdf_path)
+    def _get_cache_key(
+        self,
+        pdf_path: str,
+        page_num: int = 0,
+        dpi: int = 200,
+        variant: str = ""
+    ) -> str:
+        """Skapar en cache-nyckel baserat på PDF-sökväg, sidnummer och DPI.
+
+        variant används för att skilja på resultat som beror på mer än
+        själva filen, t.ex. OCR-språk och OCR-DPI.
+        """
+        # Använd filens modificeringstid för att detektera ändringar.
+        # mtime memoiseras med kort TTL - filer ändras sällan under en
+        # session och stat()-syscalls dominerar annars vid många lookups.
+        mtime = None
+        now = time.monotonic()
+        cached = self._mtime_cache.get(pdf_path)
+        if cached is not None and now - cached[1] < self._mtime_ttl:
+            mtime = cached[0]
+        else:
+            try:
+                mtime = os.path.getmtime(pdf_path)
+                self._mtime_cache[pdf_path] = (mtime, now)
+            except OSError:
+                # Om filen inte finns, använd bara sökvägen
+                self._mtime_cache.pop(pdf_path, None)
+
+        if mtime is not None:
             key_data = f"{pdf_path}:{page_num}:{dpi}:{mtime}"
-            return hashlib.md5(key_data.encode()).hexdigest()
-        except OSError:
-            # Om filen inte finns, använd bara sökvägen
+        else:
             key_data = f"{pdf_path}:{page_num}:{dpi}"
-            return hashlib.md5(key_data.encode()).hexdigest()
+        if variant:
+            key_data += f":{variant}"
+        # blake2b är snabbare än md5 och kortare digest ger kortare nycklar
+        return hashlib.blake2b(key_data.encode(), digest_size=8).hexdigest()
     
     def get_cached_image(
         self,
@@ -46,28 +81,33 @@ class Cache:
         """Hämtar en cachad PDF-bild."""
         cache_key = self._get_cache_key(pdf_path, page_num, dpi)
         
-        # Kolla in-memory cache först
+        # Kolla in-memory cache först (avkoda PNG-bytes vid träff)
         if cache_key in self._image_cache:
+            self._image_cache.move_to_end(cache_key)
             logger.debug(f"Cache hit (memory): {pdf_path} sid {page_num}")
-            return self._image_cache[cache_key]
-        
-        # Kolla disk cache
-        cache_file = self.cache_dir / f"image_{cache_key}.pkl"
-        if cache_file.exists():
-            try:
-                with open(cache_file, 'rb') as f:
-                    image = pickle.load(f)
-                # Lägg till i minnet om det finns plats
-                if len(self._image_cache) < self._max_memory_items:
-                    self._image_cache[cache_key] = image
-                logger.debug(f"Cache hit (disk): {pdf_path} sid {page_num}")
-                return image
-            except Exception as e:
-                logger.warning(f"Fel vid laddning av cache: {e}")
-                # Ta bort korrupt cache-fil
-                cache_file.unlink()
-        
-        return None
+            image = Image.open(io.BytesIO(self._image_cache[cache_key]))
+            image.load()
+            return image
+
+        # Kolla disk cache (öppna direkt - en miss kostar då ingen extra stat)
+        cache_file = self.cache_dir / f"image_{cache_key}.png"
+        try:
+            data = cache_file.read_bytes()
+            image = Image.open(io.BytesIO(data))
+            image.load()  # Läs in hela bilden så buffern kan återanvändas
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Fel vid laddning av cache: {e}")
+            # Ta bort korrupt cache-fil
+            cache_file.unlink(missing_ok=True)
+            return None
+
+        # Lägg till i minnet om det finns plats
+        if len(self._image_cache) < self._max_memory_items:
+            self._image_cache[cache_key] = data
+        logger.debug(f"Cache hit (disk): {pdf_path} sid {page_num}")
+        return image
     
     def cache_image(
         self,
@@ -78,67 +118,85 @@ class Cache:
     ):
         """Cachar en PDF-bild."""
         cache_key = self._get_cache_key(pdf_path, page_num, dpi)
-        
+
+        # Koda en gång till PNG-bytes; samma bytes används för både
+        # minnes- och diskcachen
+        try:
+            buf = io.BytesIO()
+            image.save(buf, format='PNG', optimize=False)
+            data = buf.getvalue()
+        except Exception as e:
+            logger.warning(f"Fel vid caching av bild: {e}")
+            return
+
         # Lägg till i minnet
         if len(self._image_cache) >= self._max_memory_items:
-            # Ta bort äldsta (FIFO)
-            oldest_key = next(iter(self._image_cache))
-            del self._image_cache[oldest_key]
-        self._image_cache[cache_key] = image
-        
-        # Spara till disk
-        cache_file = self.cache_dir / f"image_{cache_key}.pkl"
+            # Ta bort minst nyligen använd (LRU)
+            self._image_cache.popitem(last=False)
+        self._image_cache[cache_key] = data
+
+        # Spara till disk som PNG (snabbare och mindre än pickle).
+        # Skriv till tempfil + os.replace så att en krasch mitt i skrivningen
+        # aldrig lämnar en korrupt cache-fil på den slutliga sökvägen.
+        cache_file = self.cache_dir / f"image_{cache_key}.png"
+        tmp_file = cache_file.with_suffix('.png.tmp')
         try:
-            with open(cache_file, 'wb') as f:
-                pickle.dump(image, f)
+            with open(tmp_file, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_file, cache_file)
             logger.debug(f"Cachad bild: {pdf_path} sid {page_num}")
         except Exception as e:
             logger.warning(f"Fel vid caching av bild: {e}")
+            tmp_file.unlink(missing_ok=True)
     
-    def get_cached_text(self, pdf_path: str) -> Optional[str]:
+    def get_cached_text(self, pdf_path: str, variant: str = "") -> Optional[str]:
         """Hämtar cachad extraherad text."""
-        cache_key = self._get_cache_key(pdf_path, 0, 0)
+        cache_key = self._get_cache_key(pdf_path, 0, 0, variant=variant)
         
         # Kolla in-memory cache
         if cache_key in self._text_cache:
+            self._text_cache.move_to_end(cache_key)
             logger.debug(f"Cache hit (memory): text från {pdf_path}")
             return self._text_cache[cache_key]
         
-        # Kolla disk cache
+        # Kolla disk cache (öppna direkt - en miss kostar då ingen extra stat)
         cache_file = self.cache_dir / f"text_{cache_key}.txt"
-        if cache_file.exists():
-            try:
-                with open(cache_file, 'r', encoding='utf-8') as f:
-                    text = f.read()
-                # Lägg till i minnet
-                if len(self._text_cache) < self._max_memory_items:
-                    self._text_cache[cache_key] = text
-                logger.debug(f"Cache hit (disk): text från {pdf_path}")
-                return text
-            except Exception as e:
-                logger.warning(f"Fel vid laddning av text-cache: {e}")
-                cache_file.unlink()
-        
-        return None
+        try:
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                text = f.read()
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Fel vid laddning av text-cache: {e}")
+            cache_file.unlink(missing_ok=True)
+            return None
+
+        # Lägg till i minnet
+        if len(self._text_cache) < self._max_memory_items:
+            self._text_cache[cache_key] = text
+        logger.debug(f"Cache hit (disk): text från {pdf_path}")
+        return text
     
-    def cache_text(self, pdf_path: str, text: str):
+    def cache_text(self, pdf_path: str, text: str, variant: str = ""):
         """Cachar extraherad text."""
-        cache_key = self._get_cache_key(pdf_path, 0, 0)
+        cache_key = self._get_cache_key(pdf_path, 0, 0, variant=variant)
         
         # Lägg till i minnet
         if len(self._text_cache) >= self._max_memory_items:
-            oldest_key = next(iter(self._text_cache))
-            del self._text_cache[oldest_key]
+            self._text_cache.popitem(last=False)
         self._text_cache[cache_key] = text
         
-        # Spara till disk
+        # Spara till disk (tempfil + os.replace för atomisk skrivning)
         cache_file = self.cache_dir / f"text_{cache_key}.txt"
+        tmp_file = cache_file.with_suffix('.txt.tmp')
         try:
-            with open(cache_file, 'w', encoding='utf-8') as f:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
                 f.write(text)
+            os.replace(tmp_file, cache_file)
             logger.debug(f"Cachad text: {pdf_path}")
         except Exception as e:
             logger.warning(f"Fel vid caching av text: {e}")
+            tmp_file.unlink(missing_ok=True)
     
     def clear_cache(self):
         """Rensar all cache."""
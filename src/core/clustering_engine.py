@@ -2,18 +2,56 @@
 Clustering Engine - Grupperar liknande PDF:er med maskininlärning.
 """
 
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Dict, Tuple, Optional
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.cluster import AgglomerativeClustering
+from sklearn.feature_extraction.text import (
+    TfidfVectorizer,
+    HashingVectorizer,
+    TfidfTransformer
+)
+from sklearn.cluster import AgglomerativeClustering, MiniBatchKMeans
+from sklearn.exceptions import NotFittedError
 from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
+from scipy import sparse
 from .document_manager import PDFDocument
+from .logger import get_logger
+
+logger = get_logger()
+
+
+# Engine-instans per worker-process (återanvänds mellan anrop)
+_worker_engine: Optional["ClusteringEngine"] = None
+
+
+def _fingerprint_worker(text: str) -> Dict:
+    """Modulnivå-worker så att ProcessPoolExecutor kan pickla anropet."""
+    global _worker_engine
+    if _worker_engine is None:
+        _worker_engine = ClusteringEngine()
+    return _worker_engine.create_fingerprint(text)
 
 
 class ClusteringEngine:
     """Motor för klustering av PDF-dokument."""
-    
+
+    # Över detta antal dokument används den skalbara kluster-vägen
+    # (agglomerativ klustring är O(N^2) i minne för distansmatrisen)
+    _LARGE_CORPUS_THRESHOLD = 200
+
+    # Delar en rad i kolumner (flera mellanslag eller tabs)
+    _SPLIT_RE = re.compile(r'\s{2,}|\t')
+
+    # Svenska och engelska nyckelord för fakturor, kompilerade till ett
+    # enda alternationsmönster så texten bara skannas en gång
+    _KEYWORD_RE = re.compile(
+        r'\b(?:faktura|invoice|total|moms|vat|datum|date|nummer|number'
+        r'|ordernr|order\s*no|artikel|item|pris|price|antal|quantity'
+        r'|summa|sum)\w*\b'
+    )
+
     def __init__(self):
         self.vectorizer = TfidfVectorizer(
             max_features=500,
@@ -21,6 +59,11 @@ class ClusteringEngine:
             ngram_range=(1, 2),
             min_df=2
         )
+        # Svenska och engelska nyckelord för fakturor, kompilerade till ett
+        # enda alternationsmönster så texten bara skannas en gång
+        # Generation ökas vid varje omfit av vectorizern så att memoiserade
+        # TF-IDF-rader på dokumenten kan valideras
+        self._fit_generation = 0
     
     def create_fingerprint(self, text: str) -> Dict:
         """
@@ -52,52 +95,44 @@ class ClusteringEngine:
         
         return fingerprint
     
+    def create_fingerprints_batch(self, texts: List[str]) -> List[Dict]:
+        """
+        Skapar fingeravtryck för flera texter parallellt.
+
+        Fingeravtrycksberäkningen är ren CPU (regex + strängoperationer)
+        på oberoende texter, så den skalar nära linjärt över kärnor med
+        en processpool.
+        """
+        if len(texts) < 2:
+            return [self.create_fingerprint(text) for text in texts]
+
+        workers = os.cpu_count() or 1
+        chunksize = max(1, len(texts) // (4 * workers))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(
+                _fingerprint_worker, texts, chunksize=chunksize
+            ))
+
     def _extract_keywords(self, text: str) -> List[str]:
         """Extraherar nyckelord från text."""
-        # Svenska och engelska nyckelord för fakturor
-        keyword_patterns = [
-            r'\bfaktura\w*\b',
-            r'\binvoice\w*\b',
-            r'\btotal\w*\b',
-            r'\bmoms\w*\b',
-            r'\bvat\w*\b',
-            r'\bdatum\w*\b',
-            r'\bdate\w*\b',
-            r'\bnummer\w*\b',
-            r'\bnumber\w*\b',
-            r'\bordernr\w*\b',
-            r'\border\s*no\w*\b',
-            r'\bartikel\w*\b',
-            r'\bitem\w*\b',
-            r'\bpris\w*\b',
-            r'\bprice\w*\b',
-            r'\bantal\w*\b',
-            r'\bquantity\w*\b',
-            r'\bsumma\w*\b',
-            r'\bsum\w*\b',
-        ]
-        
-        found_keywords = []
-        text_lower = text.lower()
-        
-        for pattern in keyword_patterns:
-            matches = re.findall(pattern, text_lower, re.IGNORECASE)
-            found_keywords.extend(matches)
-        
-        return list(set(found_keywords))
+        found_keywords = self._KEYWORD_RE.findall(text.lower())
+        # dict.fromkeys deduplicerar i ett pass och bevarar ordningen, så
+        # fingeravtryck (och därmed serialiserad data) blir deterministiska
+        return list(dict.fromkeys(found_keywords))
     
     def _detect_table(self, text: str) -> bool:
         """Detekterar om texten innehåller en tabell."""
-        lines = text.split('\n')
         # Enkel heuristik: om flera rader har flera kolumner (separerade med flera mellanslag eller tabs)
         table_indicators = 0
-        for line in lines:
+        for line in text.split('\n'):
             # Räkna antal kolumner (flera whitespace-separerade delar)
-            parts = re.split(r'\s{2,}|\t', line.strip())
-            if len(parts) >= 3:  # Minst 3 kolumner
+            if len(self._SPLIT_RE.split(line.strip())) >= 3:  # Minst 3 kolumner
                 table_indicators += 1
-        
-        return table_indicators >= 3
+                if table_indicators >= 3:
+                    # Tillräckligt många tabellrader, ingen anledning att skanna vidare
+                    return True
+
+        return False
     
     def cluster_documents(
         self,
@@ -115,25 +150,51 @@ class ClusteringEngine:
             return {}
         
         # Skapa feature-vektorer från fingeravtryck
-        texts = []
-        for doc in documents:
-            fingerprint_text = self._fingerprint_to_text(doc.fingerprint)
-            texts.append(fingerprint_text)
-        
+        texts = [self._doc_fingerprint_text(doc) for doc in documents]
+
+        # För stora korpusar, använd den skalbara vägen (linjär i N)
+        if len(documents) > self._LARGE_CORPUS_THRESHOLD:
+            cluster_labels = self._cluster_large_corpus(texts, n_clusters)
+            if cluster_labels is not None:
+                # Fitta TF-IDF-vektorisern även här - vektoriseringen är
+                # linjär i N (det var distansmatrisen som inte skalade),
+                # och find_similar_documents transformerar mot den
+                try:
+                    tfidf_matrix = self.vectorizer.fit_transform(texts)
+                    self._fit_generation += 1
+                    for i, doc in enumerate(documents):
+                        doc._cached_tfidf_row = (
+                            self._fit_generation, tfidf_matrix[i]
+                        )
+                except ValueError:
+                    # Identiska dokument/för få features - klustringen
+                    # gäller ändå, similarity-frågor får tomt svar
+                    pass
+                return self._group_by_labels(documents, cluster_labels)
+
         # TF-IDF vektorisering
         try:
             tfidf_matrix = self.vectorizer.fit_transform(texts)
         except ValueError:
             # Om alla dokument är identiska eller för få features
             return {"cluster_0": [doc.file_path for doc in documents]}
+
+        # Memoisera raderna på dokumenten för senare similarity-frågor
+        self._fit_generation += 1
+        for i, doc in enumerate(documents):
+            doc._cached_tfidf_row = (self._fit_generation, tfidf_matrix[i])
         
         # Beräkna cosine similarity
         similarity_matrix = cosine_similarity(tfidf_matrix)
         
         # Bestäm antal kluster adaptivt om inte specificerat
         if n_clusters is None:
-            # Använd genomsnittlig similarity för att bestämma antal kluster
-            avg_similarity = np.mean(similarity_matrix[np.triu_indices_from(similarity_matrix, k=1)])
+            # Använd genomsnittlig similarity för att bestämma antal kluster.
+            # Medelvärdet över övre triangeln beräknas direkt ur summan
+            # istället för att materialisera indexarrayer och en kopia.
+            n = similarity_matrix.shape[0]
+            total = (similarity_matrix.sum() - np.trace(similarity_matrix)) / 2
+            avg_similarity = total / (n * (n - 1) / 2)
             if avg_similarity > 0.7:
                 n_clusters = max(1, len(documents) // 3)
             else:
@@ -148,22 +209,71 @@ class ClusteringEngine:
             linkage='average'
         )
         
-        # Konvertera similarity till distance
-        distance_matrix = 1 - similarity_matrix
+        # Konvertera similarity till distance (in-place - similarity-matrisen
+        # används inte efter detta)
+        distance_matrix = similarity_matrix
+        np.subtract(1.0, distance_matrix, out=distance_matrix)
         np.fill_diagonal(distance_matrix, 0)
         
         cluster_labels = clustering.fit_predict(distance_matrix)
-        
-        # Gruppera dokument efter kluster
+
+        return self._group_by_labels(documents, cluster_labels)
+
+    def _cluster_large_corpus(
+        self,
+        texts: List[str],
+        n_clusters: Optional[int]
+    ):
+        """
+        Skalbar klustring för stora korpusar.
+
+        HashingVectorizer är stateless (ingen vokabulär) och MiniBatchKMeans
+        är linjär i antal dokument, till skillnad från agglomerativ klustring
+        som kräver en N x N-distansmatris.
+
+        Returnerar kluster-labels, eller None om klustringen misslyckas.
+        """
+        if n_clusters is None:
+            n_clusters = max(1, len(texts) // 3)
+        n_clusters = min(n_clusters, len(texts))
+
+        try:
+            hasher = HashingVectorizer(
+                n_features=2**18,
+                alternate_sign=False,
+                ngram_range=(1, 2)
+            )
+            hashed = TfidfTransformer().fit_transform(hasher.transform(texts))
+            kmeans = MiniBatchKMeans(
+                n_clusters=n_clusters,
+                batch_size=256,
+                n_init=3
+            )
+            return kmeans.fit_predict(hashed)
+        except ValueError:
+            return None
+
+    def _group_by_labels(
+        self,
+        documents: List[PDFDocument],
+        cluster_labels
+    ) -> Dict[str, List[str]]:
+        """Grupperar dokument efter kluster-labels."""
         clusters = {}
         for i, doc in enumerate(documents):
             cluster_id = f"cluster_{cluster_labels[i]}"
             if cluster_id not in clusters:
                 clusters[cluster_id] = []
             clusters[cluster_id].append(doc.file_path)
-        
+
         return clusters
     
+    def _doc_fingerprint_text(self, doc: PDFDocument) -> str:
+        """Hämtar fingeravtryckstext för ett dokument, memoiserad på dokumentet."""
+        if doc._cached_fp_text is None:
+            doc._cached_fp_text = self._fingerprint_to_text(doc.fingerprint)
+        return doc._cached_fp_text
+
     def _fingerprint_to_text(self, fingerprint: Dict) -> str:
         """Konverterar fingeravtryck till text för TF-IDF."""
         parts = [
@@ -184,21 +294,35 @@ class ClusteringEngine:
         """
         if not documents:
             raise ValueError("Inga dokument att välja från")
-        
-        scores = []
-        for doc in documents:
-            fp = doc.fingerprint
-            score = (
-                fp.get("total_words", 0) * 0.4 +
-                len(fp.get("keywords", [])) * 10 * 0.3 +
-                (fp.get("total_lines", 0) / 10) * 0.2 +
-                (1 if fp.get("has_table", False) else 0) * 100 * 0.1
-            )
-            scores.append((score, doc))
-        
-        # Sortera efter score (högst först)
-        scores.sort(key=lambda x: x[0], reverse=True)
-        return scores[0][1]
+
+        # Bygg feature-arrayer och beräkna alla scores i en vektoriserad
+        # linjärkombination; argmax ersätter sorteringen (bara max behövs)
+        n = len(documents)
+        fingerprints = [doc.fingerprint for doc in documents]
+        total_words = np.fromiter(
+            (fp.get("total_words", 0) for fp in fingerprints),
+            dtype=np.float32, count=n
+        )
+        n_keywords = np.fromiter(
+            (len(fp.get("keywords", [])) for fp in fingerprints),
+            dtype=np.float32, count=n
+        )
+        total_lines = np.fromiter(
+            (fp.get("total_lines", 0) for fp in fingerprints),
+            dtype=np.float32, count=n
+        )
+        has_table = np.fromiter(
+            (1.0 if fp.get("has_table", False) else 0.0 for fp in fingerprints),
+            dtype=np.float32, count=n
+        )
+
+        scores = (
+            total_words * 0.4 +
+            n_keywords * (10 * 0.3) +
+            total_lines * (0.2 / 10) +
+            has_table * (100 * 0.1)
+        )
+        return documents[int(scores.argmax())]
     
     def find_similar_documents(
         self,
@@ -210,24 +334,48 @@ class ClusteringEngine:
         Hittar dokument som liknar referensdokumentet.
         Returnerar dokument med similarity > threshold.
         """
-        ref_text = self._fingerprint_to_text(reference_doc.fingerprint)
-        
-        similar_docs = []
-        for doc in all_documents:
-            if doc.file_path == reference_doc.file_path:
-                continue
-            
-            doc_text = self._fingerprint_to_text(doc.fingerprint)
-            
-            # Beräkna similarity
-            try:
-                vectors = self.vectorizer.transform([ref_text, doc_text])
-                similarity = cosine_similarity(vectors[0:1], vectors[1:2])[0][0]
-                
-                if similarity >= threshold:
-                    similar_docs.append(doc)
-            except:
-                # Om vektorisering misslyckas, hoppa över
-                continue
-        
-        return similar_docs
+        # Vektorisera alla dokument i en batch och beräkna alla similarities
+        # i en enda matrismultiplikation istället för en per dokument.
+        # Memoiserade TF-IDF-rader från senaste fit återanvänds.
+        try:
+            rows = []
+            missing_indices = []
+            missing_texts = []
+            for i, doc in enumerate(all_documents):
+                cached = doc._cached_tfidf_row
+                if cached is not None and cached[0] == self._fit_generation:
+                    rows.append(cached[1])
+                else:
+                    rows.append(None)
+                    missing_indices.append(i)
+                    missing_texts.append(self._doc_fingerprint_text(doc))
+
+            if missing_texts:
+                transformed = self.vectorizer.transform(missing_texts)
+                for j, i in enumerate(missing_indices):
+                    row = transformed[j]
+                    all_documents[i]._cached_tfidf_row = (self._fit_generation, row)
+                    rows[i] = row
+
+            doc_matrix = sparse.vstack(rows)
+            ref_vector = self.vectorizer.transform(
+                [self._doc_fingerprint_text(reference_doc)]
+            )
+            similarities = cosine_similarity(ref_vector, doc_matrix).ravel()
+        except NotFittedError:
+            # Ingen klustring har körts ännu - utan fittad modell finns
+            # inga likheter att beräkna. Logga så att det inte tyst ser
+            # ut som "inga liknande dokument"
+            logger.warning(
+                "find_similar_documents anropad innan TF-IDF-vektorisern "
+                "fittats (kör cluster_documents först)"
+            )
+            return []
+        except ValueError:
+            # T.ex. tom vokabulär efter fit på identiska dokument
+            return []
+
+        return [
+            doc for doc, similarity in zip(all_documents, similarities)
+            if similarity >= threshold and doc.file_path != reference_doc.file_path
+        ]
@@ -3,30 +3,62 @@ Document Manager - Hanterar PDF-dokument och deras metadata.
 """
 
 import os
-from typing import List, Dict, Optional
+import hashlib
+from contextlib import contextmanager
+from typing import Any, List, Dict, Optional
 from dataclasses import dataclass, field
 from pathlib import Path
 import json
 
 
-@dataclass
+@dataclass(slots=True)
 class PDFDocument:
     """Representerar ett PDF-dokument med dess metadata."""
     file_path: str
     cluster_id: Optional[str] = None
     fingerprint: Dict = field(default_factory=dict)
-    extracted_text: str = ""
     extracted_data: Dict = field(default_factory=dict)
     is_reference: bool = False
     status: str = "pending"  # pending, processed, mapped, reviewed, error
-    
+    text_file: Optional[str] = None  # Sökväg till extraherad text på disk
+    # Memoiserade värden från ClusteringEngine (serialiseras inte)
+    _cached_fp_text: Optional[str] = field(default=None, repr=False, compare=False)
+    _cached_tfidf_row: Optional[Any] = field(default=None, repr=False, compare=False)
+    # Extraherad text hålls utanför documents.json och laddas vid behov
+    _extracted_text: Optional[str] = field(default=None, repr=False, compare=False)
+    _text_dirty: bool = field(default=False, repr=False, compare=False)
+
+    @property
+    def extracted_text(self) -> str:
+        """Extraherad text, laddas lazily från text_file vid första åtkomst."""
+        if self._extracted_text is None:
+            if self.text_file and os.path.exists(self.text_file):
+                try:
+                    with open(self.text_file, "r", encoding="utf-8") as f:
+                        self._extracted_text = f.read()
+                except OSError:
+                    self._extracted_text = ""
+            else:
+                self._extracted_text = ""
+        return self._extracted_text
+
+    @extracted_text.setter
+    def extracted_text(self, value: str):
+        self._extracted_text = value
+        self._text_dirty = True
+
+    def invalidate_caches(self):
+        """Rensar memoiserade värden (anropas när fingerprint ändras)."""
+        self._cached_fp_text = None
+        self._cached_tfidf_row = None
+
     def to_dict(self) -> Dict:
         """Konverterar till dictionary för serialisering."""
         return {
             "file_path": self.file_path,
             "cluster_id": self.cluster_id,
             "fingerprint": self.fingerprint,
-            "extracted_text": self.extracted_text,
+            "text_file": self.text_file,
             "extracted_data": self.extracted_data,
             "is_reference": self.is_reference,
             "status": self.status
@@ -39,11 +71,14 @@ class PDFDocument:
             file_path=data["file_path"],
             cluster_id=data.get("cluster_id"),
             fingerprint=data.get("fingerprint", {}),
-            extracted_text=data.get("extracted_text", ""),
             extracted_data=data.get("extracted_data", {}),
             is_reference=data.get("is_reference", False),
-            status=data.get("status", "pending")
+            status=data.get("status", "pending"),
+            text_file=data.get("text_file")
         )
+        # Bakåtkompatibilitet: äldre documents.json har texten inline
+        if data.get("extracted_text"):
+            doc.extracted_text = data["extracted_text"]
         return doc
 
 
@@ -57,7 +92,12 @@ class DocumentManager:
         self.documents: Dict[str, PDFDocument] = {}
         self.clusters: Dict[str, List[str]] = {}  # cluster_id -> [file_paths]
         self.reference_docs: Dict[str, str] = {}  # cluster_id -> reference_file_path
-        
+
+        # Batchning av skrivningar: inom defer_saves() samlas mutationer
+        # till en enda skrivning istället för en per anrop
+        self._defer_depth = 0
+        self._dirty = False
+
         self._load_data()
     
     def add_documents(self, file_paths: List[str]) -> List[PDFDocument]:
@@ -106,11 +146,58 @@ class DocumentManager:
     
     def update_document(self, doc: PDFDocument):
         """Uppdaterar ett dokument."""
+        doc.invalidate_caches()
         self.documents[doc.file_path] = doc
         self._save_data()
     
+    @contextmanager
+    def defer_saves(self):
+        """
+        Context manager som skjuter upp skrivningar till disk.
+
+        Alla mutationer inom blocket samlas till en enda skrivning när
+        blocket avslutas - användbart vid batch-operationer över många
+        dokument (t.ex. klustering av en hel korpus).
+        """
+        self._defer_depth += 1
+        try:
+            yield
+        finally:
+            self._defer_depth -= 1
+            if self._defer_depth == 0 and self._dirty:
+                self.flush()
+
+    def flush(self):
+        """Skriver data till disk om det finns osparade ändringar."""
+        self._dirty = False
+        self._write_data()
+
     def _save_data(self):
-        """Sparar data till disk."""
+        """Sparar data till disk (uppskjuten inom defer_saves-block)."""
+        if self._defer_depth > 0:
+            self._dirty = True
+            return
+        self._write_data()
+
+    def _write_texts(self):
+        """Skriver ändrade dokumenttexter till per-dokument filer."""
+        texts_dir = self.data_dir / "texts"
+        for doc in self.documents.values():
+            if not doc._text_dirty:
+                continue
+            texts_dir.mkdir(exist_ok=True)
+            if not doc.text_file:
+                text_name = hashlib.blake2b(
+                    doc.file_path.encode(), digest_size=8
+                ).hexdigest()
+                doc.text_file = str(texts_dir / f"{text_name}.txt")
+            with open(doc.text_file, "w", encoding="utf-8") as f:
+                f.write(doc._extracted_text or "")
+            doc._text_dirty = False
+
+    def _write_data(self):
+        """Skriver data till disk."""
+        self._write_texts()
         data_file = self.data_dir / "documents.json"
         data = {
             "documents": {fp: doc.to_dict() for fp, doc in self.documents.items()},
@@ -2,9 +2,27 @@
 Extraction Engine - Extraherar data från PDF:er baserat på mallar.
 """
 
+import bisect
+import os
 import re
-from typing import Dict, List, Optional, Tuple
+import sys
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
 from pathlib import Path
+
+# pyahocorasick gör proximity-sökningen till en enda linjär skanning över
+# texten oavsett antal rubrikfält, men är ett valfritt beroende - saknas
+# det används den vanliga per-rad-sökningen
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
 from .template_manager import Template, FieldMapping, TableMapping
 from .pdf_processor import PDFProcessor
 from .document_manager import PDFDocument
@@ -14,29 +32,219 @@ from .exceptions import ExtractionError, CoordinateError, TemplateError
 
 logger = get_logger()
 
+# Delar en tabellrad i kolumner (flera mellanslag eller tabs). [ \t] istället
+# för \s eftersom raderna redan är newline-fria - då slipper regex-motorn
+# Unicode-klassificera varje tecken
+_TABLE_SPLIT_RE = re.compile(r'[ \t]{2,}|\t')
+
+
+def _split_table_line(stripped: str) -> List[str]:
+    """Delar en strippad rad i kolumner (flera mellanslag eller tabs).
+
+    Ingen str.split-snabbväg för tab-rader: dubbla tabbar ('a\\t\\tb',
+    vanlig kodning av tom cell) och tab intill mellanslag delas annars
+    annorlunda än regexen, vilket ändrar både kolumnantal och
+    kolumnjustering jämfört med den vektoriserade vägen.
+    """
+    return _TABLE_SPLIT_RE.split(stripped)
+
+
+# Fångar värdet efter en rubrik fram till radslut. [^\n]* är linjär
+# (kan inte backtracka), till skillnad från lazy (.+?)(?:\n|$)
+_HEADER_VALUE_RE = r'\s*[:]?[ \t]*([^\n]*)'
+
+
+@lru_cache(maxsize=4096)
+def _compile_header_pattern(header_text: str) -> re.Pattern:
+    """Kompilerar (och cachar) sökmönstret för en fältrubrik.
+
+    Mönstret byggs i gemener och är avsett att köras mot texten i gemener -
+    det gör matchningen skiftlägesokänslig utan IGNORECASE-kostnaden.
+    Värdet hämtas ur originaltexten via matchens offsets.
+    """
+    return re.compile(re.escape(header_text.lower()) + _HEADER_VALUE_RE)
+
+
+# Engine-instans per worker-process (återanvänds mellan anrop)
+_worker_engine: Optional["ExtractionEngine"] = None
+
+
+def _extract_worker(
+    pdf_path: str,
+    template: Template
+) -> Tuple[str, Optional[Dict], Optional[str]]:
+    """Modulnivå-worker: bygger egen engine så att self inte behöver picklas.
+
+    Fel returneras som strängar istället för att kastas, så att
+    executor.map kan fortsätta med resten av chunken.
+    """
+    global _worker_engine
+    if _worker_engine is None:
+        _worker_engine = ExtractionEngine(PDFProcessor())
+    try:
+        return pdf_path, _worker_engine.extract_data(pdf_path, template), None
+    except Exception as e:
+        return pdf_path, None, f"{type(e).__name__}: {e}"
+
 
 class ExtractionEngine:
     """Motor för extraktion av data från PDF:er."""
-    
-    def __init__(self, pdf_processor: PDFProcessor):
+
+    # Över detta antal rader splittas tabellrader vektoriserat i pandas
+    # istället för i en Python-loop
+    _VECTORIZED_MIN_LINES = 500
+
+    def __init__(self, pdf_processor: PDFProcessor, validate_tables: bool = False):
         self.pdf_processor = pdf_processor
         self.text_extractor = TextExtractor(pdf_processor)
+
+        # Kör den diagnostiska per-PDF-valideringen av tabellmappningar.
+        # Avstängd som standard - de statiska kontrollerna i
+        # Template.compile() räcker i drift, och en loggnivå är ingen
+        # pålitlig brytare (root-loggern står alltid på DEBUG för att
+        # filhandlern ska få DEBUG-poster)
+        self.validate_tables = validate_tables
+
+        # LRU-cache av extraherad text per (sökväg, mtime_ns) så att flera
+        # mallappliceringar på samma PDF inte tolkar om hela filen
+        self._text_cache: OrderedDict[Tuple[str, int], str] = OrderedDict()
+        self._text_cache_max = 64
+
+        # PDF-dimensioner per (sökväg, mtime_ns) - billiga att hålla och
+        # frågas efter en gång per tabell utan cache
+        self._dims_cache: Dict[Tuple[str, int], Tuple[float, float]] = {}
+
+    def _get_text(self, pdf_path: str, ocr_language: str) -> str:
+        """Hämtar extraherad text för en PDF, med LRU-cache i minnet.
+
+        Nyckeln inkluderar filens mtime så att en ändrad fil aldrig
+        returnerar inaktuell text.
+        """
+        try:
+            mtime_ns = os.stat(pdf_path).st_mtime_ns
+        except OSError:
+            mtime_ns = -1
+        key = (pdf_path, mtime_ns)
+
+        cached = self._text_cache.get(key)
+        if cached is not None:
+            self._text_cache.move_to_end(key)
+            return cached
+
+        # extract_text med use_ocr=False faller själv tillbaka på OCR när
+        # textlagret är tomt, så ett anrop räcker. Att anropa igen med
+        # use_ocr=True skulle tolka textlagret en andra gång i onödan.
+        text = self.pdf_processor.extract_text(
+            pdf_path, use_ocr=False, language=ocr_language
+        )
+
+        if len(self._text_cache) >= self._text_cache_max:
+            self._text_cache.popitem(last=False)
+        self._text_cache[key] = text
+        return text
+
+    def _get_pdf_dimensions(self, pdf_path: str) -> Tuple[float, float]:
+        """
+        Hämtar PDF-dimensioner med cache per (sökväg, mtime).
+
+        Returnerar A4-default om dimensionerna inte kan läsas, så att
+        anroparen aldrig behöver hantera fel här.
+        """
+        try:
+            mtime_ns = os.stat(pdf_path).st_mtime_ns
+        except OSError:
+            mtime_ns = -1
+        key = (pdf_path, mtime_ns)
+
+        dims = self._dims_cache.get(key)
+        if dims is not None:
+            return dims
+
+        try:
+            dims = self.pdf_processor.get_pdf_dimensions(pdf_path)
+        except Exception as e:
+            logger.warning(f"Kunde inte hämta PDF-dimensioner för {pdf_path}: {e}")
+            dims = None
+        if not dims:
+            dims = (612.0, 792.0)  # Default A4-storlek
+
+        self._dims_cache[key] = dims
+        return dims
+
+    def extract_batch(
+        self,
+        pdf_paths: List[str],
+        template: Template,
+        max_workers: Optional[int] = None
+    ) -> Dict[str, Dict]:
+        """
+        Extraherar data från flera PDF:er parallellt.
+
+        Extraktion är oberoende per PDF (CPU-bunden textextraktion + regex),
+        så en processpool skalar nära linjärt över kärnor.
+
+        Args:
+            pdf_paths: Sökvägar till PDF-filer
+            template: Mappningsmall
+            max_workers: Antal worker-processer (default: antal kärnor)
+
+        Returns:
+            Dictionary {pdf_path: extraktionsresultat}. PDF:er där
+            extraktionen misslyckas helt loggas och utelämnas ur resultatet.
+        """
+        results: Dict[str, Dict] = {}
+        if not pdf_paths:
+            return results
+
+        # För en enstaka PDF är poolens startkostnad inte värd det
+        if len(pdf_paths) == 1:
+            pdf_path = pdf_paths[0]
+            try:
+                results[pdf_path] = self.extract_data(pdf_path, template)
+            except Exception as e:
+                log_error_with_context(
+                    logger, e,
+                    {"file_path": pdf_path, "cluster_id": template.cluster_id},
+                    "Fel vid batch-extraktion"
+                )
+            return results
+
+        # map med chunksize skickar flera sökvägar per IPC-runda; mallen
+        # picklas en gång per chunk (pickle-memo) istället för per PDF
+        workers = max_workers or os.cpu_count() or 1
+        chunksize = max(1, len(pdf_paths) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for pdf_path, result, error in executor.map(
+                _extract_worker, pdf_paths, repeat(template), chunksize=chunksize
+            ):
+                if error is not None:
+                    logger.warning(
+                        "Batch-extraktion misslyckades för '%s': %s",
+                        pdf_path, error
+                    )
+                else:
+                    results[pdf_path] = result
+        return results
     
     def extract_data(
         self,
         pdf_path: str,
-        template: Template
+        template: Template,
+        include_raw: bool = True
     ) -> Dict:
         """
         Extraherar data från en PDF baserat på en mall.
-        
+
         Args:
             pdf_path: Sökväg till PDF-fil
             template: Mappningsmall
-        
+            include_raw: Om False utelämnas hela texten ur resultatet
+                ("raw_text" blir tom sträng) - sparar minne vid
+                batch-körningar där resultaten behålls för många PDF:er
+
         Returns:
             Dictionary med extraherad data {"fields": {...}, "tables": {...}, "raw_text": "..."}
-        
+
         Raises:
             ExtractionError: Om extraktion misslyckas helt
             TemplateError: Om mall är ogiltig
@@ -69,16 +277,12 @@ class ExtractionEngine:
                 "raw_text": ""
             }
         
-        # Extrahera text med språk från template (om tillgängligt)
+        # Extrahera text med språk från template (om tillgängligt).
+        # Textlagret cachas redan av PDFProcessor.extract_text, så upprepade
+        # mallappliceringar på samma PDF träffar cachen.
         ocr_language = getattr(template, 'ocr_language', 'swe+eng')
         try:
-            text = self.pdf_processor.extract_text(pdf_path, use_ocr=False)
-            lines = text.split('\n')
-            
-            # Om ingen text hittades, använd OCR med template-språk
-            if not text.strip():
-                text = self.pdf_processor.extract_text(pdf_path, use_ocr=True, language=ocr_language)
-                lines = text.split('\n')
+            text = self._get_text(pdf_path, ocr_language)
         except Exception as e:
             log_error_with_context(
                 logger, e,
@@ -91,60 +295,134 @@ class ExtractionEngine:
                 user_message=f"Kunde inte extrahera text från PDF: '{pdf_path}'.\n\nLoggar innehåller mer information."
             ) from e
         
+        # Dela upp texten i rader först när någon mappning behöver dem -
+        # fält som extraheras via header-sökningen rör aldrig raderna
+        lines: Optional[List[str]] = None
+
+        def get_lines() -> List[str]:
+            nonlocal lines
+            if lines is None:
+                # splitlines undviker den tomma slutsträngen från split('\n')
+                # och hanterar även \r\n från OCR-utdata
+                lines = text.splitlines()
+            return lines
+
+        # Gemener-version av texten beräknas en gång per anrop och delas
+        # mellan alla fält istället för att allokeras per fält
+        text_lower: Optional[str] = None
+
+        def get_text_lower() -> str:
+            nonlocal text_lower
+            if text_lower is None:
+                text_lower = text.lower()
+            return text_lower
+
+        # Gemener-version av raderna, delas av alla fälts proximity-sökningar
+        lower_lines: Optional[List[str]] = None
+
+        def get_lower_lines() -> List[str]:
+            nonlocal lower_lines
+            if lower_lines is None:
+                lower_lines = [line.lower() for line in get_lines()]
+            return lower_lines
+
         # Extrahera fält (returnera partiella resultat om några fält misslyckas)
         extracted_fields = {}
         failed_fields = []
-        
+        field_failures = []  # (fältnamn, exceptiontyp, meddelande)
+
+        # Snabb väg: matcha alla rubrikfält i en enda skanning över texten
+        # istället för en regex-sökning per fält
+        combined = self._get_combined_header_pattern(template)
+        if combined is not None:
+            pattern, group_map = combined
+            # Mönstret är i gemener: matcha mot gemener-texten och hämta
+            # värdet med originalskiftläge via matchens offsets
+            for match in pattern.finditer(get_text_lower()):
+                field_mapping = group_map[match.lastgroup]
+                if field_mapping.field_name not in extracted_fields:
+                    start, end = match.span(match.lastgroup)
+                    value = text[start:end].strip()
+                    if value:
+                        extracted_fields[field_mapping.field_name] = value
+
         for field_mapping in template.field_mappings:
+            if field_mapping.field_name in extracted_fields:
+                continue
             try:
                 value = self._extract_field_value(
-                    text, lines, field_mapping, pdf_path
+                    text, get_text_lower, field_mapping, pdf_path
                 )
                 if value is not None:
                     extracted_fields[field_mapping.field_name] = value
             except Exception as e:
+                # Samla felen och logga en gång efter loopen - med många
+                # fält mot fel mall blir en loggpost per fält en flaskhals
                 failed_fields.append(field_mapping.field_name)
+                field_failures.append(
+                    (field_mapping.field_name, type(e).__name__, str(e))
+                )
+                # Fortsätt med nästa fält även om ett fält misslyckas
+
+        # Proximity-sökningen körs som ett enda fusionerat pass över raderna
+        # för alla kvarvarande rubrikfält, istället för ett pass per fält
+        pending = [
+            fm for fm in template.field_mappings
+            if fm.header_text
+            and fm.field_name not in extracted_fields
+            and fm.field_name not in failed_fields
+        ]
+        if pending:
+            try:
+                extracted_fields.update(
+                    self._extract_fields_by_proximity(
+                        get_lines(), get_lower_lines(), pending
+                    )
+                )
+            except Exception as e:
                 log_error_with_context(
                     logger, e,
-                    {
-                        "field_name": field_mapping.field_name,
-                        "file_path": pdf_path,
-                        "field_type": field_mapping.field_type
-                    },
-                    f"Fel vid extraktion av fält '{field_mapping.field_name}'"
+                    {"file_path": pdf_path, "cluster_id": template.cluster_id},
+                    "Fel vid proximity-sökning av fält"
                 )
-                # Fortsätt med nästa fält även om ett fält misslyckas
-        
-        # Logga misslyckade fält om några
-        if failed_fields:
-            logger.warning(f"Följande fält misslyckades vid extraktion: {', '.join(failed_fields)}")
-        
+
+        # Logga misslyckade fält om några (en loggpost för alla fel)
+        if field_failures:
+            logger.warning(
+                "Följande fält misslyckades vid extraktion av '%s': %s",
+                pdf_path, field_failures
+            )
+
         # Extrahera tabeller (returnera partiella resultat om några tabeller misslyckas)
         extracted_tables = {}
         failed_tables = []
-        
+        table_failures = []  # (tabellnamn, exceptiontyp, meddelande)
+
+        # Dimensionerna hämtas en gång per PDF, inte en gång per tabell
+        pdf_dimensions = None
+        if template.table_mappings:
+            pdf_dimensions = self._get_pdf_dimensions(pdf_path)
+
         for table_mapping in template.table_mappings:
             try:
                 table_data = self._extract_table(
-                    text, lines, table_mapping, pdf_path
+                    text, get_lines(), table_mapping, pdf_path, pdf_dimensions
                 )
                 if table_data:
                     extracted_tables[table_mapping.table_name] = table_data
             except Exception as e:
                 failed_tables.append(table_mapping.table_name)
-                log_error_with_context(
-                    logger, e,
-                    {
-                        "table_name": table_mapping.table_name,
-                        "file_path": pdf_path
-                    },
-                    f"Fel vid extraktion av tabell '{table_mapping.table_name}'"
+                table_failures.append(
+                    (table_mapping.table_name, type(e).__name__, str(e))
                 )
                 # Fortsätt med nästa tabell även om en tabell misslyckas
-        
-        # Logga misslyckade tabeller om några
-        if failed_tables:
-            logger.warning(f"Följande tabeller misslyckades vid extraktion: {', '.join(failed_tables)}")
+
+        # Logga misslyckade tabeller om några (en loggpost för alla fel)
+        if table_failures:
+            logger.warning(
+                "Följande tabeller misslyckades vid extraktion av '%s': %s",
+                pdf_path, table_failures
+            )
         
         # Om alla extraktioner misslyckade, raise exception
         if not extracted_fields and not extracted_tables:
@@ -163,69 +441,66 @@ class ExtractionEngine:
         return {
             "fields": extracted_fields,
             "tables": extracted_tables,
-            "raw_text": text
+            "raw_text": text if include_raw else ""
         }
     
+    def _get_combined_header_pattern(
+        self,
+        template: Template
+    ) -> Optional[Tuple[re.Pattern, Dict[str, FieldMapping]]]:
+        """
+        Hämtar mallens kombinerade rubrikmönster (byggt av Template.compile).
+
+        Mallar som laddats via TemplateManager är redan kompilerade;
+        övriga kompileras vid behov här. Returnerar None om mallen saknar
+        rubrikfält eller om mönstret inte kunde kompileras (då används den
+        vanliga per-fält-vägen).
+        """
+        cached = getattr(template, '_combined_header_re', None)
+        if cached is None:
+            template.compile()
+            cached = template._combined_header_re
+        return cached or None
+
     def _extract_field_value(
         self,
         text: str,
-        lines: List[str],
+        get_text_lower: Callable[[], str],
         field_mapping: FieldMapping,
         pdf_path: str
     ) -> Optional[str]:
         """
-        Extraherar ett fältvärde.
-        
+        Extraherar ett fältvärde via rubriksökning eller koordinater.
+
+        Proximity-sökningen görs inte här utan i ett gemensamt pass för
+        alla olösta fält (se _extract_fields_by_proximity).
+
         Args:
             text: Extraherad text från PDF
-            lines: Text raderad i linjer
+            get_text_lower: Callable som returnerar texten i gemener (lazy)
             field_mapping: Fältmappning att använda
             pdf_path: Sökväg till PDF-fil (för logging)
-        
+
         Returns:
             Extraherat värde eller None om inte hittat
         
         Raises:
             CoordinateError: Om koordinater saknas eller är ogiltiga
         """
-        # Validera att field_mapping har nödvändig information
+        # Validera att field_mapping har nödvändig information.
+        # Schema-valideringen av koordinater görs en gång per mall i
+        # Template.compile() istället för här i per-PDF-vägen.
         if not field_mapping:
             logger.warning("Field mapping är None")
             return None
-        
-        # Validera koordinater om de krävs
-        if field_mapping.field_type == "value_header":
-            if not field_mapping.value_coords and not field_mapping.header_text:
-                logger.warning(
-                    f"Field mapping '{field_mapping.field_name}' saknar både koordinater och header_text"
-                )
-                return None
-            
-            # Validera koordinater om de finns
-            if field_mapping.value_coords:
-                coords = field_mapping.value_coords
-                if not all(key in coords for key in ["x", "y", "width", "height"]):
-                    log_error_with_context(
-                        logger, None,
-                        {
-                            "field_name": field_mapping.field_name,
-                            "coords": coords
-                        },
-                        "Ogiltiga koordinater i field mapping"
-                    )
-                    raise CoordinateError(
-                        f"Ogiltiga koordinater för fält '{field_mapping.field_name}': {coords}",
-                        coords=coords,
-                        pdf_path=pdf_path
-                    )
-        
+
         try:
             if field_mapping.field_type == "value_header":
                 return self._extract_value_header_field(
-                    text, lines, field_mapping
+                    text, get_text_lower, field_mapping
                 )
             else:
-                logger.warning(f"Okänd field_type: {field_mapping.field_type}")
+                logger.warning("Okänd field_type: %s", field_mapping.field_type)
                 return None
         except CoordinateError:
             # Propagera CoordinateError
@@ -238,7 +513,7 @@ class ExtractionEngine:
                     "field_type": field_mapping.field_type,
                     "pdf_path": pdf_path
                 },
-                f"Oväntat fel vid extraktion av fältvärde"
+                "Oväntat fel vid extraktion av fältvärde"
             )
             # Returnera None istället för att krascha - partial results
             return None
@@ -246,56 +521,177 @@ class ExtractionEngine:
     def _extract_value_header_field(
         self,
         text: str,
-        lines: List[str],
+        get_text_lower: Callable[[], str],
         field_mapping: FieldMapping
     ) -> Optional[str]:
         """Extraherar ett värde-rubrik-fält."""
         # Metod 1: Använd header_text om tillgängligt
         if field_mapping.header_text:
-            pattern = re.escape(field_mapping.header_text) + r'\s*[:]?\s*(.+?)(?:\n|$)'
-            match = re.search(pattern, text, re.IGNORECASE | re.MULTILINE)
-            if match:
-                return match.group(1).strip()
+            header_text = field_mapping.header_text
+            if header_text.replace(' ', '').isalnum():
+                # Snabb väg: ren substringsökning när rubriken saknar
+                # regex-specialtecken (vanligaste fallet)
+                idx = get_text_lower().find(header_text.lower())
+                if idx != -1:
+                    rest = text[idx + len(header_text):]
+                    line_end = rest.find('\n')
+                    if line_end != -1:
+                        rest = rest[:line_end]
+                    value = rest.strip().lstrip(':').strip()
+                    if value:
+                        return value
+            else:
+                # Mönstret kompileras en gång per rubrik och delas mellan
+                # alla mappningar/mallar via lru_cache. Det matchar mot
+                # gemener-texten; värdet tas ur originalet via offsets
+                match = _compile_header_pattern(header_text).search(get_text_lower())
+                if match:
+                    # [^\n]* kan matcha tomt (värdet står på nästa rad) -
+                    # behandla det som miss så att proximity-fallbacken
+                    # får chansen, precis som på snabbvägen ovan
+                    value = text[match.start(1):match.end(1)].strip()
+                    if value:
+                        return value
         
         # Metod 2: Använd koordinater om tillgängliga
         if field_mapping.value_coords:
             # För nu, returnera None - koordinatbaserad extraktion
             # kräver mer komplex implementation med PDF-koordinater
             pass
-        
-        # Metod 3: Proximity search - hitta värde nära rubriken
-        if field_mapping.header_text:
-            # Sök efter rubriken och hitta närmaste värde
-            for i, line in enumerate(lines):
-                if field_mapping.header_text.lower() in line.lower():
-                    # Kolla nästa rader för värde
-                    for j in range(i, min(i+3, len(lines))):
-                        value_line = lines[j]
-                        # Ta bort rubriken och få värdet
-                        value = value_line.replace(
-                            field_mapping.header_text, ""
-                        ).strip(": ").strip()
-                        if value and value != line:
-                            return value
-        
+
         return None
-    
+
+    def _extract_fields_by_proximity(
+        self,
+        lines: List[str],
+        lower_lines: List[str],
+        field_mappings: List[FieldMapping]
+    ) -> Dict[str, str]:
+        """
+        Proximity-sökning för flera fält i ett enda pass över raderna.
+
+        Alla olösta fält probas mot varje rad under en gemensam iteration
+        istället för en full genomgång per fält. Per träffad rubrik görs
+        en rak probe: först svansen av rubrikraden (vanligaste fallet),
+        annars någon av de två följande raderna.
+
+        Args:
+            lines: Texten raderad i linjer
+            lower_lines: Raderna i gemener
+            field_mappings: Fältmappningar med header_text som ännu saknar värde
+
+        Returns:
+            Dictionary {field_name: värde} för de fält som hittades
+        """
+        if ahocorasick is not None and len(field_mappings) > 1:
+            return self._extract_fields_by_automaton(
+                lines, lower_lines, field_mappings
+            )
+
+        pending = [
+            (fm.field_name, fm.header_text.lower(), len(fm.header_text))
+            for fm in field_mappings
+        ]
+        found: Dict[str, str] = {}
+        n_lines = len(lines)
+
+        for i, line in enumerate(lines):
+            if not pending:
+                break
+            lower_line = lower_lines[i]
+            still_pending = []
+            for entry in pending:
+                field_name, header_lower, header_len = entry
+                if header_lower not in lower_line:
+                    still_pending.append(entry)
+                    continue
+                # Rak probe: värdet står oftast efter rubriken på samma rad
+                before, _, _ = lower_line.partition(header_lower)
+                value = line[len(before) + header_len:].lstrip(': \t').rstrip()
+                if not value and i + 1 < n_lines:
+                    value = lines[i + 1].strip(': ').strip()
+                if not value and i + 2 < n_lines:
+                    value = lines[i + 2].strip(': ').strip()
+                if value:
+                    found[field_name] = value
+                else:
+                    still_pending.append(entry)
+            pending = still_pending
+
+        return found
+
+    def _extract_fields_by_automaton(
+        self,
+        lines: List[str],
+        lower_lines: List[str],
+        field_mappings: List[FieldMapping]
+    ) -> Dict[str, str]:
+        """
+        Proximity-sökning via Aho-Corasick: alla rubriker hittas i en enda
+        linjär skanning över texten, oavsett hur många fält mallen har.
+
+        Samma värde-probe som fallback-vägen: svansen av rubrikraden först,
+        annars någon av de två följande raderna.
+        """
+        # Flera fält kan dela rubriktext - samla fältnamnen per rubrik
+        by_header: Dict[str, List[str]] = {}
+        for fm in field_mappings:
+            by_header.setdefault(fm.header_text.lower(), []).append(fm.field_name)
+
+        automaton = ahocorasick.Automaton()
+        for header_lower, field_names in by_header.items():
+            automaton.add_word(header_lower, field_names)
+        automaton.make_automaton()
+
+        # Radstart-offsets för att översätta träffposition till radindex
+        line_starts = []
+        pos = 0
+        for lower_line in lower_lines:
+            line_starts.append(pos)
+            pos += len(lower_line) + 1
+
+        found: Dict[str, str] = {}
+        n_lines = len(lines)
+        n_fields = len({fm.field_name for fm in field_mappings})
+
+        for end_idx, field_names in automaton.iter('\n'.join(lower_lines)):
+            if len(found) == n_fields:
+                break
+            i = bisect.bisect_right(line_starts, end_idx) - 1
+            tail_start = end_idx - line_starts[i] + 1
+            for field_name in field_names:
+                if field_name in found:
+                    continue
+                # Rak probe: värdet står oftast efter rubriken på samma rad
+                value = lines[i][tail_start:].lstrip(': \t').rstrip()
+                if not value and i + 1 < n_lines:
+                    value = lines[i + 1].strip(': ').strip()
+                if not value and i + 2 < n_lines:
+                    value = lines[i + 2].strip(': ').strip()
+                if value:
+                    found[field_name] = value
+
+        return found
+
     def _extract_table(
         self,
         text: str,
         lines: List[str],
         table_mapping: TableMapping,
-        pdf_path: str
+        pdf_path: str,
+        pdf_dimensions: Optional[Tuple[float, float]] = None
     ) -> List[Dict]:
         """
         Extraherar tabelldata.
-        
+
         Args:
             text: Extraherad text från PDF
             lines: Text raderad i linjer
             table_mapping: Tabellmappning att använda
             pdf_path: Sökväg till PDF-fil (för logging)
-        
+            pdf_dimensions: (bredd, höjd) i points om anroparen redan har
+                dem; annars hämtas de via den cachade uppslagningen
+
         Returns:
             Lista med dictionaries med tabelldata (en dict per rad)
         
@@ -311,9 +707,17 @@ class ExtractionEngine:
             logger.warning(f"Table mapping '{table_mapping.table_name}' saknar kolumner")
             return []
         
-        # Ytterligare validering av tabellstruktur
-        validation_warnings = self._validate_table_mapping(text, lines, table_mapping, pdf_path)
-        if validation_warnings:
+        # Splitta tabellraderna en gång och dela resultatet mellan
+        # valideringen och den textbaserade extraktionen
+        split_lines = self._split_table_lines(lines, len(table_mapping.columns))
+
+        # Ytterligare validering av tabellstruktur. Per-PDF-valideringen är
+        # ren diagnostik - de statiska kontrollerna görs i Template.compile()
+        # och den här körs bara när den uttryckligen begärts
+        if self.validate_tables:
+            validation_warnings = self._validate_table_mapping(
+                text, lines, table_mapping, pdf_path, table_lines=split_lines
+            )
             for warning in validation_warnings:
                 logger.warning(f"Tabellvalidering - {warning}")
         
@@ -339,11 +743,9 @@ class ExtractionEngine:
         
         try:
             # Hämta PDF-dimensioner för koordinatbaserad extraktion
-            pdf_dimensions = self.pdf_processor.get_pdf_dimensions(pdf_path)
-            if not pdf_dimensions:
-                logger.warning(f"Kunde inte hämta PDF-dimensioner för {pdf_path}")
-                pdf_dimensions = (612.0, 792.0)  # Default A4-storlek
-            
+            if pdf_dimensions is None:
+                pdf_dimensions = self._get_pdf_dimensions(pdf_path)
+
             pdf_width, pdf_height = pdf_dimensions
             
             # Använd språk från template om tillgängligt
@@ -362,7 +764,9 @@ class ExtractionEngine:
                 )
             else:
                 # Fallback till textbaserad extraktion
-                return self._extract_table_from_text(lines, table_mapping)
+                return self._extract_table_from_text(
+                    lines, table_mapping, table_lines=split_lines
+                )
             
         except CoordinateError:
             # Propagera CoordinateError
@@ -375,7 +779,7 @@ class ExtractionEngine:
                     "pdf_path": pdf_path,
                     "columns": len(table_mapping.columns)
                 },
-                f"Oväntat fel vid extraktion av tabell"
+                "Oväntat fel vid extraktion av tabell"
             )
             # Returnera tom lista istället för att krascha - partial results
             return []
@@ -403,12 +807,10 @@ class ExtractionEngine:
         """
         table_data = []
         
-        # Sortera kolumner efter index
-        sorted_columns = sorted(
-            table_mapping.columns,
-            key=lambda c: c.get("index", 0)
-        )
-        
+        # Kolumner som ColSpec-tuples, sorterade på index och cachade på
+        # mappningen (attributåtkomst istället för dict.get per cell)
+        sorted_columns = table_mapping.sorted_cols()
+
         # Sortera rader efter index
         sorted_rows = []
         if table_mapping.row_coords:
@@ -426,28 +828,44 @@ class ExtractionEngine:
             table_top = table_mapping.table_coords.get("y", 0)
             table_bottom = table_top + table_mapping.table_coords.get("height", 0)
             
-            # Skapa rader med samma höjd som header
-            current_y = header_y + header_height
-            row_index = 0
-            while current_y < table_bottom:
-                sorted_rows.append({
-                    "y": current_y,
-                    "height": header_height,
-                    "index": row_index
-                })
-                current_y += header_height
-                row_index += 1
+            # Skapa rader med samma höjd som header. arange beräknar varje
+            # y som start + i*steg, så höga tabeller får ingen ackumulerad
+            # flyttalsdrift som den gamla additionsloopen
+            row_ys = np.arange(header_y + header_height, table_bottom, header_height)
+            sorted_rows = [
+                {"y": float(row_y), "height": header_height, "index": row_index}
+                for row_index, row_y in enumerate(row_ys)
+            ]
         
-        # Extrahera data från varje cell
+        # OCR:a hela tabellområdet en gång och bucketera orden per cell
+        # utifrån deras boxar, istället för en OCR-körning per cell
+        # (rader x kolumner Tesseract-starter per PDF)
+        words = self.text_extractor.extract_words_in_bbox(
+            pdf_path, 0, table_mapping.table_coords,
+            pdf_width, pdf_height, language
+        )
+
+        # SoA-layout: ordcentra som numpy-arrayer, sorterade i läsordning
+        # en gång, så att varje cell blir en vektoriserad maskoperation
+        if words:
+            boxes = np.array([w[:4] for w in words], dtype=np.float32)
+            order = np.lexsort((boxes[:, 0], boxes[:, 1]))  # (y0, x0)
+            centers_x = ((boxes[:, 0] + boxes[:, 2]) * 0.5)[order]
+            centers_y = ((boxes[:, 1] + boxes[:, 3]) * 0.5)[order]
+            word_texts = [words[i][4] for i in order]
+        else:
+            centers_x = centers_y = None
+            word_texts = []
+
         for row_info in sorted_rows:
             row_y = row_info.get("y", 0)
             row_height = row_info.get("height", 0.05)
-            
+
             row_data = {}
-            for col_mapping in sorted_columns:
-                col_name = col_mapping.get("name", "")
-                col_coords = col_mapping.get("coords")
-                
+            for col_spec in sorted_columns:
+                col_name = col_spec.name
+                col_coords = col_spec.coords
+
                 if col_coords:
                     # Beräkna cellkoordinater
                     cell_coords = {
@@ -456,72 +874,142 @@ class ExtractionEngine:
                         "width": col_coords.get("width", 0),
                         "height": row_height
                     }
-                    
-                    # Extrahera text från cell
-                    cell_text = self.text_extractor.extract_table_cell(
-                        pdf_path,
-                        0,
-                        cell_coords,
-                        pdf_width,
-                        pdf_height,
-                        language
+
+                    row_data[col_name] = self._words_in_cell(
+                        centers_x, centers_y, word_texts, cell_coords
                     )
-                    
-                    row_data[col_name] = cell_text.strip()
                 else:
                     row_data[col_name] = ""
-            
+
             # Lägg till rad om den inte är helt tom
             if any(row_data.values()):
                 table_data.append(row_data)
-        
+
         return table_data
+
+    @staticmethod
+    def _words_in_cell(
+        centers_x: Optional[np.ndarray],
+        centers_y: Optional[np.ndarray],
+        word_texts: List[str],
+        cell_coords: Dict
+    ) -> str:
+        """
+        Plockar de ord vars centrum ligger inom cellen och sätter ihop dem
+        i läsordning (uppifrån och ner, vänster till höger).
+
+        Args:
+            centers_x: Ordcentras x-koordinater, sorterade i läsordning
+            centers_y: Ordcentras y-koordinater, samma ordning
+            word_texts: Ordens texter, samma ordning
+            cell_coords: Cellens koordinater {x, y, width, height}
+
+        Returns:
+            Cellens text (tom sträng om inga ord träffar cellen)
+        """
+        if centers_x is None:
+            return ""
+
+        cx0 = cell_coords.get("x", 0)
+        cy0 = cell_coords.get("y", 0)
+        cx1 = cx0 + cell_coords.get("width", 0)
+        cy1 = cy0 + cell_coords.get("height", 0)
+
+        mask = (
+            (centers_x >= cx0) & (centers_x < cx1) &
+            (centers_y >= cy0) & (centers_y < cy1)
+        )
+        if not mask.any():
+            return ""
+        return " ".join(word_texts[i] for i in np.nonzero(mask)[0])
     
+    def _split_table_lines(
+        self,
+        lines: List[str],
+        min_columns: int
+    ) -> List[List[str]]:
+        """
+        Splittar rader i kolumner och behåller dem som ser ut som tabellrader
+        (minst min_columns kolumner).
+
+        Args:
+            lines: Text raderad i linjer
+            min_columns: Minsta antal kolumner för att räknas som tabellrad
+
+        Returns:
+            Lista med kolumnlistor, en per tabellrad
+        """
+        if len(lines) > self._VECTORIZED_MIN_LINES:
+            # Splitta alla rader i ett vektoriserat pandas-pass (C-nivå)
+            # istället för en regex-split per rad i Python
+            stripped = pd.Series(lines, dtype="object").str.strip()
+            expanded = stripped.str.split(r'[ \t]{2,}|\t', expand=True, regex=True)
+            mask = expanded.notna().sum(axis=1) >= min_columns
+            return [
+                [cell for cell in row if cell is not None]
+                for row in expanded[mask].to_numpy().tolist()
+            ]
+
+        table_lines = []
+        for line in lines:
+            # Kontrollera om raden ser ut som en tabellrad
+            parts = _split_table_line(line.strip())
+            if len(parts) >= min_columns:
+                table_lines.append(parts)
+        return table_lines
+
     def _extract_table_from_text(
         self,
         lines: List[str],
-        table_mapping: TableMapping
+        table_mapping: TableMapping,
+        table_lines: Optional[List[List[str]]] = None
     ) -> List[Dict]:
         """
         Extraherar tabelldata från text (fallback-metod).
-        
+
         Args:
             lines: Text raderad i linjer
             table_mapping: Tabellmappning
-        
+            table_lines: Redan splittade tabellrader (om anroparen har dem;
+                annars splittas lines här)
+
         Returns:
             Lista med dictionaries med tabelldata
         """
         table_data = []
-        
+
         # För nu, extrahera rader baserat på kolumnmappningar
         start_line = 0
         if table_mapping.has_header_row:
             start_line = 1
-        
+
         # Identifiera tabellrader (rader med flera kolumner)
-        table_lines = []
-        for line in lines:
-            # Kontrollera om raden ser ut som en tabellrad
-            parts = re.split(r'\s{2,}|\t', line.strip())
-            if len(parts) >= len(table_mapping.columns):
-                table_lines.append(parts)
-        
-        # Mappa kolumner
+        if table_lines is None:
+            table_lines = self._split_table_lines(lines, len(table_mapping.columns))
+
+        # Mappa kolumner. Index/namn slås upp en gång utanför radloopen
+        # istället för per rad, och namnen internas så att alla rader delar
+        # samma nyckelobjekt
+        col_pairs = [
+            (col_mapping.get("index", 0), sys.intern(col_mapping.get("name", "")))
+            for col_mapping in table_mapping.columns
+        ]
         for row_parts in table_lines[start_line:]:
+            n_parts = len(row_parts)
+            # Tomhetskollen görs medan raden fylls, så dicten slipper
+            # skannas en andra gång via any(row_data.values())
             row_data = {}
-            for col_mapping in table_mapping.columns:
-                col_index = col_mapping.get("index", 0)
-                col_name = col_mapping.get("name", "")
-                if col_index < len(row_parts):
-                    row_data[col_name] = row_parts[col_index].strip()
-                else:
-                    row_data[col_name] = ""
-            
+            has_value = False
+            for col_index, col_name in col_pairs:
+                cell = row_parts[col_index].strip() if col_index < n_parts else ""
+                row_data[col_name] = cell
+                if cell:
+                    has_value = True
+
             # Lägg till rad om den inte är tom
-            if any(row_data.values()):
+            if has_value:
                 table_data.append(row_data)
-        
+
         return table_data
     
     def _match_column(
@@ -560,57 +1048,40 @@ class ExtractionEngine:
                 best_distance = distance
         
         return best_match
-            
-        except CoordinateError:
-            # Propagera CoordinateError
-            raise
-        except Exception as e:
-            log_error_with_context(
-                logger, e,
-                {
-                    "table_name": table_mapping.table_name,
-                    "pdf_path": pdf_path,
-                    "columns": len(table_mapping.columns)
-                },
-                f"Oväntat fel vid extraktion av tabell"
-            )
-            # Returnera tom lista istället för att krascha - partial results
-            return []
-    
+
     def _validate_table_mapping(
         self,
         text: str,
         lines: List[str],
         table_mapping: TableMapping,
-        pdf_path: str
+        pdf_path: str,
+        table_lines: Optional[List[List[str]]] = None
     ) -> List[str]:
         """
-        Validerar tabellmappning och returnerar varningar.
-        
+        Validerar tabellmappningen mot dokumentets innehåll och returnerar
+        varningar. De statiska kontrollerna (kolumnindices mot varandra)
+        görs i Template.compile(); här valideras bara det som beror på PDF:en.
+
         Args:
             text: Extraherad text från PDF
             lines: Text raderad i linjer
             table_mapping: Tabellmappning att validera
             pdf_path: Sökväg till PDF-fil (för logging)
-        
+            table_lines: Redan splittade tabellrader (om anroparen har dem;
+                annars splittas lines här)
+
         Returns:
             Lista med varningsmeddelanden (tom lista om inga varningar)
         """
         warnings = []
-        
+
         if not table_mapping or not table_mapping.columns:
             return warnings
-        
-        # Validering 1: Kontrollera att alla kolumnindices är rimliga
-        max_expected_cols = max(col_mapping.get("index", 0) + 1 for col_mapping in table_mapping.columns)
-        
-        # Validering 2: Kontrollera tabellstruktur (samma antal kolumner per rad)
-        table_lines = []
-        for line in lines:
-            parts = re.split(r'\s{2,}|\t', line.strip())
-            if len(parts) >= len(table_mapping.columns):
-                table_lines.append(parts)
-        
+
+        # Validering 1: Kontrollera tabellstruktur (samma antal kolumner per rad)
+        if table_lines is None:
+            table_lines = self._split_table_lines(lines, len(table_mapping.columns))
+
         if table_lines:
             col_counts = [len(parts) for parts in table_lines]
             unique_counts = set(col_counts)
@@ -630,17 +1101,8 @@ class ExtractionEngine:
                         f"men tabellen har endast {max_actual_cols} kolumner."
                     )
         
-        # Validering 3: Kontrollera att header-rad finns om den förväntas
+        # Validering 2: Kontrollera att header-rad finns om den förväntas
         if table_mapping.has_header_row and not table_lines:
             warnings.append("Header-rad förväntas men inga tabellrader hittades.")
-        
-        # Validering 4: Kontrollera att kolumner inte är för nära varandra
-        col_indices = sorted([cm.get("index", 0) for cm in table_mapping.columns])
-        for i in range(len(col_indices) - 1):
-            if col_indices[i+1] - col_indices[i] == 1:
-                warnings.append(
-                    f"Kolumner med index {col_indices[i]} och {col_indices[i+1]} är intill varandra. "
-                    "Kontrollera att kolumner är korrekt separerade."
-                )
-        
+
         return warnings
\ No newline at end of file
@@ -8,6 +8,7 @@ för vanliga loggings-scenarion.
 import logging
 import logging.handlers
 import sys
+import threading
 from datetime import datetime
 from pathlib import Path
 from typing import Optional, Dict, Any
@@ -84,34 +85,39 @@ def setup_logger(
     return logger
 
 
-# Global logger-instans
-_logger: Optional[logging.Logger] = None
+# Skyddar handler-uppsättningen vid första anropet; logging.getLogger är
+# själv idempotent så någon modulglobal instans behövs inte
+_configure_lock = threading.Lock()
 
 
 def get_logger() -> logging.Logger:
     """
     Hämtar global logger-instans.
-    
+
     Logger loggar till både console (INFO) och fil (DEBUG) med rotation.
     Log-filnamn inkluderar datum för lättare hantering.
     """
-    global _logger
-    if _logger is None:
-        # Skapa logs-katalog om den inte finns
-        logs_dir = Path("logs")
-        logs_dir.mkdir(exist_ok=True)
-        
-        # Log-filnamn med datum (app-2026-01-16.log)
-        log_filename = f"app-{datetime.now().strftime('%Y-%m-%d')}.log"
-        log_file = str(logs_dir / log_filename)
-        
-        _logger = setup_logger(
-            log_file=log_file,
-            level=logging.INFO,
-            console_level=logging.INFO,  # Console: INFO och högre
-            file_level=logging.DEBUG     # Fil: DEBUG och högre
-        )
-    return _logger
+    logger = logging.getLogger("ocr_mapping")
+    if logger.handlers:
+        return logger
+
+    with _configure_lock:
+        if not logger.handlers:
+            # Skapa logs-katalog om den inte finns
+            logs_dir = Path("logs")
+            logs_dir.mkdir(exist_ok=True)
+
+            # Log-filnamn med datum (app-2026-01-16.log)
+            log_filename = f"app-{datetime.now().strftime('%Y-%m-%d')}.log"
+            log_file = str(logs_dir / log_filename)
+
+            setup_logger(
+                log_file=log_file,
+                level=logging.INFO,
+                console_level=logging.INFO,  # Console: INFO och högre
+                file_level=logging.DEBUG     # Fil: DEBUG och högre
+            )
+    return logger
 
 
 def log_error_with_context(
@@ -129,12 +135,17 @@ def log_error_with_context(
         context: Dict med kontextuell information (t.ex. filnamn, funktion, etc.)
         message: Meddelande att logga (default: "Error occurred")
     """
-    # Bygg strukturerat meddelande med kontext
+    # Hoppa över formateringen helt om ERROR inte loggas - anropen sitter
+    # i extraktionens heta loopar
+    if not logger.isEnabledFor(logging.ERROR):
+        return
+
+    # Bygg strukturerat meddelande med kontext; %s-formateringen görs
+    # lazy av logging-modulen
     context_str = ", ".join(f"{k}={v}" for k, v in context.items())
-    full_message = f"{message} - Context: {context_str}"
-    
+
     # Logga med stack trace
-    logger.error(full_message, exc_info=error)
+    logger.error("%s - Context: %s", message, context_str, exc_info=error)
 
 
 def log_function_call(
@@ -152,19 +163,24 @@ def log_function_call(
         args: Positionella argument (tuple)
         kwargs: Nyckelordsargument (dict)
     """
+    # Argumentsträngarna är dyra att bygga - hoppa över helt när DEBUG
+    # är bortfiltrerat
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+
     if kwargs is None:
         kwargs = {}
-    
+
     # Bygg argumentsträng (begränsa längd för långa värden)
     args_str = ", ".join(str(arg)[:100] for arg in args[:5])  # Max 5 args, 100 chars each
     kwargs_str = ", ".join(f"{k}={str(v)[:100]}" for k, v in list(kwargs.items())[:5])
-    
+
     call_str = f"{func_name}({args_str}"
     if kwargs_str:
         call_str += f", {kwargs_str}"
     call_str += ")"
-    
-    logger.debug(f"Calling: {call_str}")
+
+    logger.debug("Calling: %s", call_str)
 
 
 def log_performance(
@@ -182,14 +198,17 @@ def log_performance(
         duration: Varaktighet i sekunder
         context: Ytterligare kontextuell information (valfritt)
     """
+    if not logger.isEnabledFor(logging.INFO):
+        return
+
     context_str = ""
     if context:
         context_str = f" - Context: {', '.join(f'{k}={v}' for k, v in context.items())}"
-    
+
     # Formatera varaktighet (visa ms om < 1s, annars sekunder)
     if duration < 1.0:
         duration_str = f"{duration * 1000:.1f}ms"
     else:
         duration_str = f"{duration:.2f}s"
-    
-    logger.info(f"Performance: {operation} took {duration_str}{context_str}")
+
+    logger.info("Performance: %s took %s%s", operation, duration_str, context_str)
@@ -2,15 +2,43 @@
 PDF Processor - Hanterar PDF-läsning och OCR.
 """
 
+import io
+import multiprocessing
 import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from typing import Optional, Tuple
 from pathlib import Path
 import PyPDF2
-from pdf2image import convert_from_path
+from pdf2image import convert_from_path, pdfinfo_from_path
 from PIL import Image, ImageEnhance, ImageFilter
 import pytesseract
 import numpy as np
 from scipy import ndimage
+
+# PyMuPDF (fitz) är avsevärt snabbare än PyPDF2 på textextraktion men är
+# ett valfritt beroende - saknas det används PyPDF2 som tidigare
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+# OpenCV:s SIMD-stödda filter är flera gånger snabbare än scipy-
+# motsvarigheterna i bildförbehandlingen, men är ett valfritt beroende -
+# saknas det används scipy som tidigare
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+# tesserocr håller Tesseract-API:t i processen så att språkmodellen
+# laddas en gång istället för en subprocess-start per sida; valfritt
+# beroende - saknas det används pytesseract som tidigare
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
 from .logger import get_logger, log_error_with_context
 from .cache import get_cache
 from .exceptions import (
@@ -28,6 +56,96 @@ _tesseract_path: Optional[str] = None
 _poppler_checked: Optional[bool] = None
 _poppler_path: Optional[str] = None
 
+# Processor-instans per OCR-arbetsprocess; skapas lazily vid första sidan
+_ocr_worker_processor: Optional["PDFProcessor"] = None
+
+
+def _init_ocr_worker() -> None:
+    """
+    Initierar en OCR-arbetsprocess.
+
+    Tesseracts inbyggda OpenMP-trådning är ineffektiv och konkurrerar med
+    processpoolen om kärnorna - en enkeltrådad Tesseract per arbetare är
+    snabbare än flera flertrådade.
+    """
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+# In-process-Tesseract-API per process, återanvänds mellan sidor så länge
+# språket är detsamma
+_tesserocr_api = None
+_tesserocr_lang: Optional[str] = None
+
+
+def _ocr_image(image: Image.Image, language: str) -> str:
+    """
+    OCR:ar en PIL-bild.
+
+    Med tesserocr återanvänds ett in-process-API med laddad språkmodell
+    mellan sidorna; utan faller vi tillbaka på pytesseract, som startar en
+    tesseract-subprocess per anrop.
+    """
+    global _tesserocr_api, _tesserocr_lang
+    if tesserocr is None:
+        return pytesseract.image_to_string(image, lang=language)
+
+    if _tesserocr_api is None or _tesserocr_lang != language:
+        if _tesserocr_api is not None:
+            _tesserocr_api.End()
+        _tesserocr_api = tesserocr.PyTessBaseAPI(lang=language)
+        _tesserocr_lang = language
+    _tesserocr_api.SetImage(image)
+    return _tesserocr_api.GetUTF8Text()
+
+
+def _ocr_page_worker(
+    pdf_path: str,
+    page_num: int,
+    language: str,
+    poppler_path: Optional[str],
+    dpi: int = 300
+) -> Tuple[str, Optional[str]]:
+    """
+    Rastrerar och OCR:ar en sida (1-indexerad) i en arbetsprocess.
+
+    Modulnivå så att funktionen är picklbar; sidan rastreras här istället
+    för i huvudprocessen så att bara en sidbild i taget finns per process.
+    Returnerar (text, None) vid framgång eller ("", felbeskrivning) - fel
+    per sida får inte stoppa resten av dokumentet.
+    """
+    global _ocr_worker_processor
+    if _ocr_worker_processor is None:
+        _ocr_worker_processor = PDFProcessor()
+    try:
+        # Gråskala direkt från Poppler (pdftocairo-backenden är snabbare
+        # än pdftoppm) - förbehandlingen konverterar ändå till 'L', så
+        # RGB-pixlarna skulle bara kastas
+        images = convert_from_path(
+            pdf_path,
+            dpi=dpi,
+            first_page=page_num,
+            last_page=page_num,
+            thread_count=1,
+            use_pdftocairo=True,
+            grayscale=True,
+            **({"poppler_path": poppler_path} if poppler_path else {})
+        )
+        if not images:
+            return "", "sidan kunde inte rastreras"
+        processed_image = _ocr_worker_processor._preprocess_image(images[0])
+        return _ocr_image(processed_image, language), None
+    except Exception as e:
+        return "", f"{type(e).__name__}: {e}"
+
+
+def _prepend_to_path(directory: str) -> None:
+    """
+    Lägger en katalog först i PATH, men bara om den inte redan finns där -
+    upprepade PDFProcessor-instanser ska inte växa PATH obegränsat.
+    """
+    current = os.environ.get("PATH", "")
+    if directory not in current.split(os.pathsep):
+        os.environ["PATH"] = directory + os.pathsep + current
+
 
 def check_tesseract_available(tesseract_cmd: Optional[str] = None) -> Tuple[bool, Optional[str]]:
     """
@@ -101,7 +219,7 @@ def check_poppler_available(poppler_path: Optional[str] = None) -> Tuple[bool, O
     if poppler_path:
         poppler_bin = Path(poppler_path)
         if poppler_bin.exists():
-            os.environ["PATH"] = str(poppler_bin) + os.pathsep + os.environ.get("PATH", "")
+            _prepend_to_path(str(poppler_bin))
             found_path = poppler_path
             _poppler_checked = True
             _poppler_path = found_path
@@ -115,7 +233,7 @@ def check_poppler_available(poppler_path: Optional[str] = None) -> Tuple[bool, O
         ]
         for path in possible_poppler_paths:
             if os.path.exists(path):
-                os.environ["PATH"] = path + os.pathsep + os.environ.get("PATH", "")
+                _prepend_to_path(path)
                 found_path = path
                 break
     
@@ -163,19 +281,28 @@ def get_poppler_installation_guide() -> str:
 
 class PDFProcessor:
     """Hanterar PDF-läsning och OCR."""
-    
+
+    # Max antal parsade PdfReader-objekt som hålls i minnet
+    _READER_CACHE_MAX = 4
+
     def __init__(
         self,
         tesseract_cmd: Optional[str] = None,
-        poppler_path: Optional[str] = None
+        poppler_path: Optional[str] = None,
+        ocr_dpi: int = 300
     ):
         """
         Initierar PDF-processor.
-        
+
         Args:
             tesseract_cmd: Sökväg till tesseract executable (för Windows)
             poppler_path: Sökväg till Poppler bin-mapp (för Windows, t.ex. "C:\\poppler\\Library\\bin")
+            ocr_dpi: Upplösning för OCR-rastrering. Tesseracts träffsäkerhet
+                planar ut runt 200-300 DPI för tryckt text, och OCR-tiden
+                skalar med pixelantalet - 200 kan användas för snabbare
+                körningar. Oberoende av förhandsvisningens DPI.
         """
+        self.ocr_dpi = ocr_dpi
         # Använd helper-funktioner för dependency-detektering
         self.tesseract_available, tesseract_found_path = check_tesseract_available(tesseract_cmd)
         if not self.tesseract_available:
@@ -186,6 +313,32 @@ class PDFProcessor:
         if not self.poppler_available:
             logger.warning("Poppler hittades inte. PDF-till-bild konvertering kommer inte att fungera.")
             logger.info(f"Installationsguide:\n{get_poppler_installation_guide()}")
+
+        # Parsad PdfReader per fil (mtime-nycklad) - textextraktion och
+        # dimensionshämtning på samma PDF delar då xref-parsningen
+        self._reader_cache: "OrderedDict[str, Tuple[int, PyPDF2.PdfReader]]" = OrderedDict()
+
+    def _get_reader(self, pdf_path: str) -> PyPDF2.PdfReader:
+        """
+        Hämtar en (cachad) PdfReader för filen.
+
+        Filen läses in i minnet och parsas en gång; cachen invalideras när
+        filens mtime ändras och håller max _READER_CACHE_MAX poster.
+        """
+        mtime_ns = os.stat(pdf_path).st_mtime_ns
+        cached = self._reader_cache.get(pdf_path)
+        if cached is not None and cached[0] == mtime_ns:
+            self._reader_cache.move_to_end(pdf_path)
+            return cached[1]
+
+        with open(pdf_path, 'rb') as file:
+            data = file.read()
+        reader = PyPDF2.PdfReader(io.BytesIO(data))
+
+        self._reader_cache[pdf_path] = (mtime_ns, reader)
+        if len(self._reader_cache) > self._READER_CACHE_MAX:
+            self._reader_cache.popitem(last=False)
+        return reader
     
     def extract_text(self, pdf_path: str, use_ocr: bool = False, language: str = "swe+eng") -> str:
         """
@@ -213,11 +366,13 @@ class PDFProcessor:
                 user_message=f"Kunde inte hitta PDF-fil: '{pdf_path}'.\n\nKontrollera att filen existerar och att sökvägen är korrekt."
             )
         
-        # Kolla cache först (endast om use_ocr=False, eftersom OCR kan variera)
-        if not use_ocr:
-            cached_text = cache.get_cached_text(pdf_path)
-            if cached_text:
-                return cached_text
+        # Kolla cache först. OCR-resultat cachas under en egen variant-nyckel
+        # som inkluderar språk och DPI eftersom båda påverkar resultatet -
+        # OCR är det dyraste steget och vinner mest på att cachas.
+        cache_variant = f"ocr:{language}:{self.ocr_dpi}" if use_ocr else ""
+        cached_text = cache.get_cached_text(pdf_path, variant=cache_variant)
+        if cached_text:
+            return cached_text
         
         try:
             # Försök extrahera text direkt från PDF
@@ -237,9 +392,9 @@ class PDFProcessor:
                     # Annars låt exceptionen propagera
                     raise
             
-            # Cache texten (endast om use_ocr=False)
-            if text and not use_ocr:
-                cache.cache_text(pdf_path, text)
+            # Cache texten under samma nyckel som slogs upp ovan
+            if text:
+                cache.cache_text(pdf_path, text, variant=cache_variant)
             
             return text
             
@@ -271,36 +426,51 @@ class PDFProcessor:
         Raises:
             PDFProcessingError: Om PDF inte kan läsas eller är korrupt
         """
+        # Snabb väg: PyMuPDF om det är installerat. Faller tillbaka på
+        # PyPDF2 om biblioteket saknas eller inte hittar någon text.
+        if fitz is not None:
+            text = self._extract_text_with_fitz(pdf_path)
+            if text.strip():
+                return text
+
         text_parts = []
-        
+
         try:
-            with open(pdf_path, 'rb') as file:
+            try:
+                pdf_reader = self._get_reader(pdf_path)
+            except Exception as e:
+                log_error_with_context(
+                    logger, e,
+                    {"file_path": pdf_path},
+                    "Fel vid läsning av PDF-struktur"
+                )
+                raise PDFProcessingError(
+                    f"PDF:en är korrupt eller kan inte läsas: {str(e)}",
+                    file_path=pdf_path,
+                    user_message=f"Kunde inte läsa PDF: '{pdf_path}'.\n\nKontrollera att PDF:en är korruptfri och inte lösenordsskyddad."
+                ) from e
+
+            for page_num, page in enumerate(pdf_reader.pages):
                 try:
-                    pdf_reader = PyPDF2.PdfReader(file)
+                    page_text = page.extract_text()
+                    if page_text:
+                        text_parts.append(page_text)
+                    elif page_num == 0 and self._looks_image_only(page):
+                        # Första sidan saknar både text och typsnitt men
+                        # innehåller bilder - typiskt en skannad PDF.
+                        # Hoppa direkt till OCR i stället för att
+                        # tomparsa resterande sidor.
+                        logger.debug(
+                            f"PDF ser ut att sakna text-lager: {pdf_path}"
+                        )
+                        return ""
                 except Exception as e:
                     log_error_with_context(
                         logger, e,
-                        {"file_path": pdf_path},
-                        "Fel vid läsning av PDF-struktur"
+                        {"file_path": pdf_path, "page_num": page_num},
+                        f"Fel vid läsning av sida {page_num}"
                     )
-                    raise PDFProcessingError(
-                        f"PDF:en är korrupt eller kan inte läsas: {str(e)}",
-                        file_path=pdf_path,
-                        user_message=f"Kunde inte läsa PDF: '{pdf_path}'.\n\nKontrollera att PDF:en är korruptfri och inte lösenordsskyddad."
-                    ) from e
-                
-                for page_num, page in enumerate(pdf_reader.pages):
-                    try:
-                        page_text = page.extract_text()
-                        if page_text:
-                            text_parts.append(page_text)
-                    except Exception as e:
-                        log_error_with_context(
-                            logger, e,
-                            {"file_path": pdf_path, "page_num": page_num},
-                            f"Fel vid läsning av sida {page_num}"
-                        )
-                        # Fortsätt med nästa sida även om en sida misslyckas
+                    # Fortsätt med nästa sida även om en sida misslyckas
         
         except PDFProcessingError:
             # Propagera PDFProcessingError
@@ -318,7 +488,47 @@ class PDFProcessor:
             ) from e
         
         return "\n".join(text_parts)
-    
+
+    @staticmethod
+    def _looks_image_only(page) -> bool:
+        """
+        Avgör om en sida sannolikt är helt skannad (bild utan text-lager).
+
+        En sida utan /Font-resurser kan inte rita text, och /XObject
+        utan /Font är den typiska signaturen för en inskannad sida.
+        Vid minsta tveksamhet returneras False så att resterande sidor
+        ändå parsas.
+        """
+        try:
+            resources = page.get("/Resources")
+            if resources is None:
+                return False
+            resources = resources.get_object()
+            return "/XObject" in resources and "/Font" not in resources
+        except Exception:
+            return False
+
+    def _extract_text_with_fitz(self, pdf_path: str) -> str:
+        """
+        Extraherar text med PyMuPDF (fitz).
+
+        Args:
+            pdf_path: Sökväg till PDF-fil
+
+        Returns:
+            Extraherad text (tom sträng vid fel - anroparen faller då
+            tillbaka på PyPDF2)
+        """
+        try:
+            with fitz.open(pdf_path) as doc:
+                return "\n".join(page.get_text("text") for page in doc)
+        except Exception as e:
+            logger.warning(
+                f"PyMuPDF kunde inte läsa '{pdf_path}': {e}, "
+                "faller tillbaka på PyPDF2"
+            )
+            return ""
+
     def _extract_text_with_ocr(self, pdf_path: str, language: str = "swe+eng") -> str:
         """
         Extraherar text med OCR.
@@ -357,17 +567,17 @@ class PDFProcessor:
         text_parts = []
         
         try:
-            # Konvertera PDF till bilder
-            # Använd poppler_path om det är konfigurerat
+            # Läs bara sidantalet här - sidorna rastreras en i taget (i
+            # arbetsprocesserna eller i den sekventiella loopen) så att
+            # inte alla sidbilder på 300 DPI ligger i minnet samtidigt
             try:
                 if self.poppler_path:
-                    images = convert_from_path(
-                        pdf_path,
-                        dpi=300,
-                        poppler_path=self.poppler_path
+                    pdf_info = pdfinfo_from_path(
+                        pdf_path, poppler_path=self.poppler_path
                     )
                 else:
-                    images = convert_from_path(pdf_path, dpi=300)
+                    pdf_info = pdfinfo_from_path(pdf_path)
+                page_count = int(pdf_info["Pages"])
             except Exception as e:
                 error_str = str(e).lower()
                 if "poppler" in error_str or "pdfinfo" in error_str:
@@ -387,25 +597,79 @@ class PDFProcessor:
                 else:
                     raise
             
-            for page_num, image in enumerate(images):
+            # Tesseract är enkeltrådat och CPU-bundet per anrop - kör
+            # sidorna parallellt i en processpool. Varje arbetare rastrerar
+            # sin egen sida från sökvägen, så inga sidbilder picklas mellan
+            # processerna. Poolen hoppas över om vi redan kör i en
+            # batch-arbetsprocess (extract_batch), annars övertecknas CPU:n
+            # med nästlade pooler
+            ocr_results = None
+            if page_count > 1 and multiprocessing.parent_process() is None:
                 try:
-                    # Förbehandling för bättre OCR
-                    processed_image = self._preprocess_image(image)
-                    
-                    # OCR med angivet språk
-                    ocr_text = pytesseract.image_to_string(
-                        processed_image,
-                        lang=language
-                    )
-                    text_parts.append(ocr_text)
+                    with ProcessPoolExecutor(
+                        max_workers=min(page_count, os.cpu_count() or 1),
+                        initializer=_init_ocr_worker
+                    ) as executor:
+                        ocr_results = list(
+                            executor.map(
+                                _ocr_page_worker,
+                                repeat(pdf_path),
+                                range(1, page_count + 1),
+                                repeat(language),
+                                repeat(self.poppler_path),
+                                repeat(self.ocr_dpi)
+                            )
+                        )
                 except Exception as e:
-                    log_error_with_context(
-                        logger, e,
-                        {"file_path": pdf_path, "page_num": page_num},
-                        f"Fel vid OCR på sida {page_num}"
+                    logger.warning(
+                        "Parallell OCR misslyckades (%s) - kör sekventiellt", e
                     )
-                    # Fortsätt med nästa sida även om OCR misslyckas på en sida
-                    logger.warning(f"Skippar sida {page_num} på grund av OCR-fel")
+                    ocr_results = None
+
+            if ocr_results is not None:
+                # Samma 1-indexering som arbetarna och den sekventiella vägen
+                for page_num, (ocr_text, error) in enumerate(ocr_results, start=1):
+                    if error is not None:
+                        # Fortsätt med nästa sida även om OCR misslyckas
+                        logger.warning(
+                            "Skippar sida %s på grund av OCR-fel: %s",
+                            page_num, error
+                        )
+                    else:
+                        text_parts.append(ocr_text)
+            else:
+                # Sekventiell väg: en sida i taget, bilden släpps innan
+                # nästa rastreras
+                for page_num in range(1, page_count + 1):
+                    try:
+                        images = convert_from_path(
+                            pdf_path,
+                            dpi=self.ocr_dpi,
+                            first_page=page_num,
+                            last_page=page_num,
+                            thread_count=1,
+                            use_pdftocairo=True,
+                            grayscale=True,
+                            **({"poppler_path": self.poppler_path}
+                               if self.poppler_path else {})
+                        )
+                        if not images:
+                            continue
+
+                        # Förbehandling för bättre OCR
+                        processed_image = self._preprocess_image(images[0])
+
+                        # OCR med angivet språk
+                        ocr_text = _ocr_image(processed_image, language)
+                        text_parts.append(ocr_text)
+                    except Exception as e:
+                        log_error_with_context(
+                            logger, e,
+                            {"file_path": pdf_path, "page_num": page_num},
+                            f"Fel vid OCR på sida {page_num}"
+                        )
+                        # Fortsätt med nästa sida även om OCR misslyckas på en sida
+                        logger.warning(f"Skippar sida {page_num} på grund av OCR-fel")
         
         except (DependencyNotFoundError, OCRProcessingError):
             # Propagera custom exceptions
@@ -503,6 +767,8 @@ class PDFProcessor:
         try:
             # Använd median filter för noise reduction
             # Median filter är effektivt för salt-and-pepper noise
+            if cv2 is not None:
+                return cv2.medianBlur(img_array, 3)
             denoised = ndimage.median_filter(img_array, size=3)
             return denoised.astype(np.uint8)
         except Exception as e:
@@ -527,7 +793,15 @@ class PDFProcessor:
             # Se till att block_size är udda
             if block_size % 2 == 0:
                 block_size += 1
-            
+
+            if cv2 is not None:
+                return cv2.adaptiveThreshold(
+                    img_array, 255,
+                    cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                    cv2.THRESH_BINARY,
+                    block_size, C
+                )
+
             # Beräkna lokalt genomsnitt med gaussian blur
             local_mean = ndimage.gaussian_filter(img_array.astype(np.float32), sigma=block_size / 3)
             
@@ -703,28 +977,27 @@ class PDFProcessor:
             )
         
         try:
-            with open(pdf_path, 'rb') as file:
-                try:
-                    pdf_reader = PyPDF2.PdfReader(file)
-                except Exception as e:
-                    log_error_with_context(
-                        logger, e,
-                        {"file_path": pdf_path},
-                        "Fel vid läsning av PDF-struktur (dimensioner)"
-                    )
-                    raise PDFProcessingError(
-                        f"PDF:en är korrupt eller kan inte läsas: {str(e)}",
-                        file_path=pdf_path,
-                        user_message=f"Kunde inte läsa PDF-dimensioner från '{pdf_path}'.\n\nKontrollera att PDF:en är korruptfri."
-                    ) from e
-                
-                if not pdf_reader.pages:
-                    logger.warning(f"PDF har inga sidor: {pdf_path}")
-                    return None
-                
-                page = pdf_reader.pages[0]
-                return (float(page.mediabox.width), float(page.mediabox.height))
-                
+            try:
+                pdf_reader = self._get_reader(pdf_path)
+            except Exception as e:
+                log_error_with_context(
+                    logger, e,
+                    {"file_path": pdf_path},
+                    "Fel vid läsning av PDF-struktur (dimensioner)"
+                )
+                raise PDFProcessingError(
+                    f"PDF:en är korrupt eller kan inte läsas: {str(e)}",
+                    file_path=pdf_path,
+                    user_message=f"Kunde inte läsa PDF-dimensioner från '{pdf_path}'.\n\nKontrollera att PDF:en är korruptfri."
+                ) from e
+
+            if not pdf_reader.pages:
+                logger.warning(f"PDF har inga sidor: {pdf_path}")
+                return None
+
+            page = pdf_reader.pages[0]
+            return (float(page.mediabox.width), float(page.mediabox.height))
+
         except PDFProcessingError:
             # Propagera PDFProcessingError
             raise
@@ -3,6 +3,8 @@ Template Manager - Hanterar mappningsmallar.
 """
 
 import json
+import re
+from collections import namedtuple
 from typing import Dict, List, Optional
 from pathlib import Path
 from dataclasses import dataclass, field, asdict
@@ -24,6 +26,11 @@ class FieldMapping:
     table_coords: Optional[Dict] = None  # För tabeller
 
 
+# Kolumnspecifikation med attributåtkomst istället för dict.get() i
+# extraktionens heta loopar
+ColSpec = namedtuple("ColSpec", ["index", "name", "coords"])
+
+
 @dataclass
 class TableMapping:
     """Representerar en tabellmappning."""
@@ -34,6 +41,30 @@ class TableMapping:
     row_coords: Optional[List[Dict]] = None  # [{"y": 0.3, "height": 0.05, "index": 0}, ...]
     header_row_coords: Optional[Dict] = None  # {"y": 0.3, "height": 0.05}
 
+    def sorted_cols(self) -> List[ColSpec]:
+        """
+        Kolumnerna som ColSpec-tuples sorterade på index.
+
+        Byggs en gång per mappning och cachas - dict-uppslagningarna görs
+        då inte om för varje cell i extraktionsloopen. Cachen nollställs
+        av Template.compile() när mallen sparas om.
+        """
+        cached = getattr(self, "_sorted_cols", None)
+        if cached is None:
+            cached = sorted(
+                (
+                    ColSpec(
+                        col.get("index", 0),
+                        col.get("name", ""),
+                        col.get("coords")
+                    )
+                    for col in self.columns
+                ),
+                key=lambda col: col.index
+            )
+            self._sorted_cols = cached
+        return cached
+
 
 @dataclass
 class Template:
@@ -43,7 +74,81 @@ class Template:
     field_mappings: List[FieldMapping] = field(default_factory=list)
     table_mappings: List[TableMapping] = field(default_factory=list)
     ocr_language: str = "swe+eng"  # Tesseract language code (default: svenska + engelska)
-    
+
+    def compile(self) -> None:
+        """
+        Bygger det kombinerade rubrikmönstret som matchar alla mallens
+        rubrikfält i en enda skanning (används av ExtractionEngine).
+
+        En mall är oföränderlig under en batch-körning, så mönstret byggs
+        en gång vid laddning/sparande istället för per extraktion.
+        Resultatet lagras som _combined_header_re: en tuple
+        (pattern, {gruppnamn: FieldMapping}) eller () om mallen saknar
+        rubrikfält eller mönstret inte kan kompileras.
+
+        Här görs även schema-valideringen av mappningarna, en gång per
+        mall istället för en gång per PDF i extraktionsloopen.
+        """
+        required_coord_keys = ("x", "y", "width", "height")
+        for fm in self.field_mappings:
+            if fm.value_coords and not all(
+                key in fm.value_coords for key in required_coord_keys
+            ):
+                logger.warning(
+                    f"Fält '{fm.field_name}' i kluster '{self.cluster_id}' "
+                    f"har ogiltiga koordinater: {fm.value_coords}"
+                )
+            if fm.field_type == "value_header" and not fm.value_coords and not fm.header_text:
+                logger.warning(
+                    f"Fält '{fm.field_name}' i kluster '{self.cluster_id}' "
+                    f"saknar både koordinater och header_text"
+                )
+
+        # Kolumnspecifikationerna kan ha ändrats - låt dem byggas om lazily
+        for tm in self.table_mappings:
+            tm._sorted_cols = None
+            # Statisk tabellvalidering: intilliggande kolumnindices tyder
+            # på att kolumnerna inte separerats korrekt vid mappningen
+            col_indices = sorted(col.get("index", 0) for col in tm.columns)
+            for i in range(len(col_indices) - 1):
+                if col_indices[i + 1] - col_indices[i] == 1:
+                    logger.warning(
+                        f"Tabell '{tm.table_name}' i kluster '{self.cluster_id}': "
+                        f"kolumner med index {col_indices[i]} och {col_indices[i + 1]} "
+                        "är intill varandra. Kontrollera att kolumner är korrekt separerade."
+                    )
+
+        alternatives = []
+        group_map: Dict[str, FieldMapping] = {}
+        for i, field_mapping in enumerate(self.field_mappings):
+            if not field_mapping.header_text:
+                continue
+            group_name = f"f{i}"
+            group_map[group_name] = field_mapping
+            # Rubriken läggs in i gemener och mönstret körs mot texten i
+            # gemener - billigare än att låta regex-motorn skiftlägesjämföra
+            # varje tecken via IGNORECASE
+            alternatives.append(
+                re.escape(field_mapping.header_text.lower()) +
+                r'\s*[:]?[ \t]*(?P<' + group_name + r'>[^\n]*)'
+            )
+
+        if not alternatives:
+            self._combined_header_re = ()
+            return
+
+        try:
+            pattern = re.compile('|'.join(alternatives))
+        except re.error as e:
+            logger.warning(
+                f"Kunde inte bygga kombinerat rubrikmönster för kluster "
+                f"'{self.cluster_id}': {e}"
+            )
+            self._combined_header_re = ()
+            return
+
+        self._combined_header_re = (pattern, group_map)
+
     def to_dict(self) -> Dict:
         """Konverterar till dictionary."""
         return {
@@ -118,6 +223,8 @@ class TemplateManager:
     
     def save_template(self, template: Template):
         """Sparar en mall."""
+        # Mappningarna kan ha ändrats - bygg om det kompilerade mönstret
+        template.compile()
         self.templates[template.cluster_id] = template
         self._save_template_to_file(template)
     
@@ -139,6 +246,7 @@ class TemplateManager:
                 with open(template_file, "r", encoding="utf-8") as f:
                     data = json.load(f)
                 template = Template.from_dict(data)
+                template.compile()
                 self.templates[template.cluster_id] = template
             except Exception as e:
                 logger.error(f"Fel vid laddning av mall {template_file}: {e}", exc_info=True)
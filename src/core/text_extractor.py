@@ -2,7 +2,7 @@
 Text Extractor - Extraherar text från specifika områden i PDF:er.
 """
 
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from PIL import Image
 import pytesseract
 import re
@@ -151,6 +151,93 @@ class TextExtractor:
             logger.error(f"Fel vid extraktion av tabell: {e}", exc_info=True)
             return []
     
+    def extract_words_in_bbox(
+        self,
+        pdf_path: str,
+        page_num: int,
+        bbox_coords: dict,
+        pdf_width: float,
+        pdf_height: float,
+        language: str = "swe+eng"
+    ) -> List[Tuple[float, float, float, float, str]]:
+        """
+        OCR:ar ett område en gång och returnerar alla ord med sina boxar.
+
+        Gör en enda Tesseract-körning för hela området istället för en per
+        cell - anroparen kan sedan bucketera orden per cell via koordinater.
+
+        Args:
+            pdf_path: Sökväg till PDF
+            page_num: Sidnummer (0-indexerat)
+            bbox_coords: Dictionary med x, y, width, height (normaliserade 0.0-1.0)
+            pdf_width: PDF:s bredd i points
+            pdf_height: PDF:s höjd i points
+            language: Tesseract språkkod
+
+        Returns:
+            Lista med (x0, y0, x1, y1, text) där koordinaterna är
+            normaliserade mot hela sidan (0.0-1.0)
+        """
+        try:
+            # Hämta PDF-bild
+            pdf_image = self.pdf_processor.get_page_image(pdf_path, page_num)
+            if not pdf_image:
+                return []
+
+            # Konvertera normaliserade koordinater till pixel-koordinater
+            img_width, img_height = pdf_image.size
+
+            x = int(bbox_coords.get("x", 0) * img_width)
+            y = int(bbox_coords.get("y", 0) * img_height)
+            width = int(bbox_coords.get("width", 0) * img_width)
+            height = int(bbox_coords.get("height", 0) * img_height)
+
+            # Säkerställ att koordinaterna är inom bildens gränser
+            x = max(0, min(img_width, x))
+            y = max(0, min(img_height, y))
+            width = max(1, min(img_width - x, width))
+            height = max(1, min(img_height - y, height))
+
+            region = pdf_image.crop((x, y, x + width, y + height))
+
+            # Förbehandla bilden för bättre OCR-resultat
+            try:
+                processed_image = self.pdf_processor._preprocess_image(
+                    region,
+                    enable_adaptive_threshold=True,
+                    enable_noise_reduction=True,
+                    enable_contrast_enhancement=True,
+                    enable_skew_correction=False
+                )
+            except Exception:
+                processed_image = region
+
+            # En OCR-körning för hela området, med ordboxar
+            data = pytesseract.image_to_data(
+                processed_image,
+                lang=language,
+                output_type=pytesseract.Output.DICT
+            )
+
+            words = []
+            for i, word in enumerate(data["text"]):
+                word = word.strip()
+                if not word:
+                    continue
+                # Ordets pixelkoordinater är relativa mot urklippet -
+                # translatera till sidan och normalisera
+                wx0 = (x + data["left"][i]) / img_width
+                wy0 = (y + data["top"][i]) / img_height
+                wx1 = (x + data["left"][i] + data["width"][i]) / img_width
+                wy1 = (y + data["top"][i] + data["height"][i]) / img_height
+                words.append((wx0, wy0, wx1, wy1, word))
+
+            return words
+
+        except Exception as e:
+            logger.error(f"Fel vid ordextraktion från område: {e}", exc_info=True)
+            return []
+
     def extract_table_cell(
         self,
         pdf_path: str,
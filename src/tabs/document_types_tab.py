@@ -283,24 +283,27 @@ class DocumentTypesTab(QWidget):
                     # Ta bort kluster från document manager
                     del self.document_manager.clusters[cluster_id]
                     
-                    # Om referensdokument finns, ta bort referens-flaggan
-                    for doc in self.document_manager.get_all_documents():
-                        if doc.file_path in cluster_file_paths:
-                            doc.is_reference = False
-                            # Återställ status om det var mapped
-                            if doc.status == "mapped":
-                                doc.status = "processed"
-                            # Rensa cluster_id
-                            doc.cluster_id = None
-                            # Spara uppdateringar
-                            self.document_manager.update_document(doc)
-                    
-                    # Ta bort referensdokument från reference_docs om det finns
-                    if cluster_id in self.document_manager.reference_docs:
-                        del self.document_manager.reference_docs[cluster_id]
-                    
-                    # Spara ändringar i document manager
-                    self.document_manager._save_data()
+                    # En diskskrivning för hela borttagningen i stället
+                    # för en per dokument
+                    with self.document_manager.defer_saves():
+                        # Om referensdokument finns, ta bort referens-flaggan
+                        for doc in self.document_manager.get_all_documents():
+                            if doc.file_path in cluster_file_paths:
+                                doc.is_reference = False
+                                # Återställ status om det var mapped
+                                if doc.status == "mapped":
+                                    doc.status = "processed"
+                                # Rensa cluster_id
+                                doc.cluster_id = None
+                                # Spara uppdateringar
+                                self.document_manager.update_document(doc)
+
+                        # Ta bort referensdokument från reference_docs om det finns
+                        if cluster_id in self.document_manager.reference_docs:
+                            del self.document_manager.reference_docs[cluster_id]
+
+                        # Spara ändringar i document manager
+                        self.document_manager._save_data()
                 
                 # Uppdatera UI
                 self.refresh_clusters()
@@ -1501,27 +1501,33 @@ class MappingTab(QWidget):
             successful = 0
             failed = 0
             
-            for doc in cluster_docs:
-                try:
-                    result = self.extraction_engine.extract_data(
-                        doc.file_path,
-                        self.current_template
-                    )
-                    doc.extracted_data = result
-                    doc.status = "mapped"
-                    self.document_manager.update_document(doc)
-                    successful += 1
-                except Exception as e:
-                    doc.status = "error"
-                    failed += 1
-                    log_error_with_context(
-                        self.logger, e,
-                        {
-                            "file_path": doc.file_path,
-                            "cluster_id": self.current_cluster_id
-                        },
-                        "Fel vid extraktion från dokument"
-                    )
+            # En diskskrivning av documents.json för hela batchen i
+            # stället för en per dokument
+            with self.document_manager.defer_saves():
+                for doc in cluster_docs:
+                    try:
+                        # Resultatet sparas i documents.json - hoppa över
+                        # råtexten så att filen inte sväller med hela PDF-texter
+                        result = self.extraction_engine.extract_data(
+                            doc.file_path,
+                            self.current_template,
+                            include_raw=False
+                        )
+                        doc.extracted_data = result
+                        doc.status = "mapped"
+                        self.document_manager.update_document(doc)
+                        successful += 1
+                    except Exception as e:
+                        doc.status = "error"
+                        failed += 1
+                        log_error_with_context(
+                            self.logger, e,
+                            {
+                                "file_path": doc.file_path,
+                                "cluster_id": self.current_cluster_id
+                            },
+                            "Fel vid extraktion från dokument"
+                        )
             
             # Visa resultat
             result_msg = f"Mappning klar!\n\nLyckades: {successful} PDF:er\nMisslyckades: {failed} PDF:er"
@@ -213,18 +213,23 @@ class ReviewTab(QWidget):
                     self.current_doc.cluster_id or ""
                 )
                 if template:
-                    for similar_doc in similar_docs:
-                        try:
-                            result = self.extraction_engine.extract_data(
-                                similar_doc.file_path,
-                                template
-                            )
-                            similar_doc.extracted_data = result
-                            similar_doc.status = "mapped"
-                            self.document_manager.update_document(similar_doc)
-                        except Exception as e:
-                            similar_doc.status = "error"
-                            print(f"Fel vid re-extraktion: {e}")
+                    # En diskskrivning för hela batchen i stället för en
+                    # per dokument
+                    with self.document_manager.defer_saves():
+                        for similar_doc in similar_docs:
+                            try:
+                                # Råtexten behövs inte när resultatet persisteras
+                                result = self.extraction_engine.extract_data(
+                                    similar_doc.file_path,
+                                    template,
+                                    include_raw=False
+                                )
+                                similar_doc.extracted_data = result
+                                similar_doc.status = "mapped"
+                                self.document_manager.update_document(similar_doc)
+                            except Exception as e:
+                                similar_doc.status = "error"
+                                print(f"Fel vid re-extraktion: {e}")
                     
                     QMessageBox.information(
                         self,